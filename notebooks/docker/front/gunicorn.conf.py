@@ -0,0 +1,22 @@
+"""
+Gunicorn settings of the front-end
+
+    gunicorn --config gunicorn.conf.py web:server
+
+Figures are built before workers are forked (preload_app),
+so workers share them through copy-on-write memory.
+Settings can be changed by environment variables WEB_PORT, WEB_WORKERS, WEB_THREADS.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('WEB_PORT', '8050')}"
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# threads of each worker: callbacks are mostly cache lookups
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+preload_app = True
+timeout = 60
+keepalive = 5
+accesslog = os.environ.get('WEB_ACCESS_LOG')
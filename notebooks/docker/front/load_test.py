@@ -0,0 +1,85 @@
+"""
+Load test of the front-end: concurrent users change dropdowns of the skill map
+
+Every user sends callback requests (as the browser does on dropdown change) in a loop,
+latency percentiles are printed for each endpoint.
+
+    gunicorn --config gunicorn.conf.py web:server
+    python load_test.py http://127.0.0.1:8050 50 20
+
+Arguments: url, users (50), requests per user (20)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import json
+import sys
+import time
+import urllib.request
+import numpy as np
+
+# dropdown values as in web.py
+TOP_OPTIONS = ['50 новыков каждой профессии', '100 новыков каждой профессии', '200 новыков каждой профессии']
+ALG_OPTIONS = ['1-вый алгоритм', '2-вый алгоритм', '3-ий алгоритм']
+
+
+def callback_payload(top: str, alg: str) -> bytes:
+    return json.dumps({
+        'output': 'scatter-plot.figure',
+        'outputs': {'id': 'scatter-plot', 'property': 'figure'},
+        'inputs': [{'id': 'top-dropdown', 'property': 'value', 'value': top},
+                   {'id': 'alg-dropdown', 'property': 'value', 'value': alg}],
+        'changedPropIds': ['top-dropdown.value'],
+    }).encode('utf-8')
+
+
+def timed_request(req: urllib.request.Request) -> tuple:
+    """(seconds, response bytes on wire)"""
+
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=60) as response:
+        body = response.read()
+        if response.status != 200:
+            raise ValueError(f'HTTP {response.status}: {req.full_url}')
+        if response.headers.get('Content-Encoding') == 'gzip':
+            gzip.decompress(body)
+    return time.perf_counter() - start, len(body)
+
+
+def user(url: str, requests: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    result = {'callback': [], 'layout': [], 'bytes': []}
+
+    seconds, _ = timed_request(urllib.request.Request(f'{url}/_dash-layout', headers={'Accept-Encoding': 'gzip'}))
+    result['layout'].append(seconds)
+
+    for _ in range(requests):
+        req = urllib.request.Request(f'{url}/_dash-update-component',
+            data=callback_payload(rng.choice(TOP_OPTIONS), rng.choice(ALG_OPTIONS)),
+            headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+        seconds, size = timed_request(req)
+        result['callback'].append(seconds)
+        result['bytes'].append(size)
+
+    return result
+
+
+if __name__ == '__main__':
+
+    url = sys.argv[1] if len(sys.argv) > 1 else 'http://127.0.0.1:8050'
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    with urllib.request.urlopen(f'{url}/healthz', timeout=10) as response:
+        print('healthz:', response.read().decode('utf-8'))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        results = list(executor.map(lambda i: user(url, requests, i), range(users)))
+    total = time.perf_counter() - start
+
+    print(f'{users} users, {users * requests} callbacks in {total:.1f} s ({users * requests / total:.0f} rps)')
+    for name in ['layout', 'callback']:
+        ms = np.array([x for r in results for x in r[name]]) * 1000
+        print(f'{name:<10} p50 {np.percentile(ms, 50):8.1f} ms   p99 {np.percentile(ms, 99):8.1f} ms')
+    print(f'callback response {np.mean([x for r in results for x in r["bytes"]]) / 1024:.0f} KB (compressed)')
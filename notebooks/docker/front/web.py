@@ -1,9 +1,29 @@
+from collections import OrderedDict
+import json
+import logging
+import os
+import threading
+from typing import Callable, Iterable
 from dash import Dash, dcc, html, Input, Output
+from flask import Flask, jsonify, request
+from flask_compress import Compress
 import plotly.express as px
 import plotly
 import pandas as pd
 
-def plot_skill_map(df: pd.DataFrame, width=1000, height=600) -> plotly.graph_objs.Figure:
+logging.basicConfig(level=logging.INFO, format='%(asctime)s  %(levelname)s:  %(message)s')
+log = logging.getLogger('front')
+
+PLOT_DF_FOLDER = 'data/plot_df'
+# map of all skills, rendered by WebGL with level of detail
+LANDSCAPE_FILENAME = os.path.join(PLOT_DF_FOLDER, 'landscape.csv')
+# maximum of points of the landscape in the current view
+LOD_MAX_POINTS = 1500
+TOP_OPTIONS = ['50 новыков каждой профессии', '100 новыков каждой профессии', '200 новыков каждой профессии']
+ALG_OPTIONS = ['1-вый алгоритм', '2-вый алгоритм', '3-ий алгоритм']
+
+def plot_skill_map(df: pd.DataFrame, width=1000, height=600, webgl: bool = False) -> plotly.graph_objs.Figure:
+    """Skill map figure, webgl: scattergl traces without marker outlines for thousands of points"""
 
     color_list = [
         '#F8A19F', '#AA0DFE', '#3283FE', '#1CBE4F', '#C4451C', '#F6222E', 
@@ -29,9 +49,10 @@ def plot_skill_map(df: pd.DataFrame, width=1000, height=600) -> plotly.graph_obj
                     size='size', category_orders={'Профессия': prof_order},
                     #color_discrete_sequence=px.colors.qualitative.Plotly,
                     color_discrete_sequence=color_list,
+                    render_mode='webgl' if webgl else 'svg',
                     title = None, width=width, height=height)
 
-    fig.update_traces(marker=dict(opacity=0.7, line=dict(width=0.5, color='DarkSlateGrey')), 
+    fig.update_traces(marker=dict(opacity=0.7, line=dict(width=0 if webgl else 0.5, color='DarkSlateGrey')), 
                   selector=dict(mode='markers'))
 
     fig.update_xaxes(visible=False)
@@ -39,45 +60,103 @@ def plot_skill_map(df: pd.DataFrame, width=1000, height=600) -> plotly.graph_obj
 
     return fig
 
-# def plot_prof_map(df: pd.DataFrame, width=1000, height=600) -> plotly.graph_objs.Figure:
-    
-#     fig = px.scatter(df, x='x', y='y',
-#         color='Профессия', hover_name='Навык', 
-#         hover_data= {'x':False, 'y':False, 'size':False, 'Профессия': False},
-#         title = None, width=width, height=height)
+def decimate(df: pd.DataFrame, max_points: int, x_range: tuple = None, y_range: tuple = None) -> pd.DataFrame:
+    """
+        Level of detail: points inside the view, no more than max_points of the most frequent skills (size).
+        Zooming in shows less frequent skills of the area
+    """
 
-#     fig.update_traces(marker=dict(size=20, line=dict(width=0.5, color='DarkSlateGrey')), 
-#                       selector=dict(mode='markers'))
+    if x_range is not None:
+        df = df[df.x.between(*sorted(x_range))]
+    if y_range is not None:
+        df = df[df.y.between(*sorted(y_range))]
+    if df.shape[0] > max_points:
+        df = df.nlargest(max_points, 'size', keep='first')
 
-#     fig.update_xaxes(visible=False)
-#     fig.update_yaxes(visible=False)
+    return df
 
-#     return fig
+def view_ranges(relayout_data: dict) -> tuple:
+    """(x_range, y_range) of relayoutData of the graph, None for autorange"""
 
-app = Dash(__name__)
+    relayout_data = relayout_data or {}
+    ranges = []
+    for axis in ['xaxis', 'yaxis']:
+        if f'{axis}.range[0]' in relayout_data:
+            ranges.append((relayout_data[f'{axis}.range[0]'], relayout_data[f'{axis}.range[1]']))
+        elif f'{axis}.range' in relayout_data:
+            ranges.append(tuple(relayout_data[f'{axis}.range']))
+        else:
+            ranges.append(None)
 
-df = pd.read_csv(f'data/plot_df/best.csv')
-fig = plot_skill_map(df, width=1200, height=750)
+    return tuple(ranges)
 
-app.layout = html.Div([
-    html.H4('Интерактивная карта навыков (можно выбрать разные режимы в выпающих списках и кликать категории в легенде)'),
-    # dcc.Dropdown(['50 новыков каждой профессии', '100 новыков каждой профессии', '200 новыков каждой профессии'], 
-    #              '100 новыков каждой профессии', id='top-dropdown'),
-    # dcc.Dropdown(['1-вый алгоритм', '2-вый алгоритм', '3-ий алгоритм'], 
-    #              '1-вый алгоритм', id='alg-dropdown'),
-    # dcc.Graph(id="scatter-plot"),
+def payload_size(figure: dict) -> int:
+    """Size of figure json in bytes"""
+    return len(json.dumps(figure, ensure_ascii=False).encode('utf-8'))
 
-    dcc.Graph(id="scatter-plot", figure=fig),
+class FigureCache:
+    """
+        Skill map figures of plot_df files.
+        Figure is built and serialized to json-compatible dict once and served from memory,
+        it is rebuilt when the file is modified (mtime). Least recently used figures are evicted
+    """
 
-])
+    def __init__(self, builder: Callable[[pd.DataFrame], plotly.graph_objs.Figure], maxsize: int = 32):
+        self.builder = builder
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # filename -> (mtime, data frame, figure, payload size)
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
 
+    def __len__(self) -> int:
+        """Number of cached figures"""
+        return len(self._figures)
 
+    def _entry(self, filename: str) -> tuple:
+        mtime = os.stat(filename).st_mtime_ns
+        with self._lock:
+            cached = self._figures.get(filename)
+            if cached is not None and cached[0] == mtime:
+                self._figures.move_to_end(filename)
+                self.hits += 1
+                return cached
+
+        df = pd.read_csv(filename)
+        figure = json.loads(self.builder(df).to_json())
+        entry = (mtime, df, figure, payload_size(figure))
+        log.info('figure %s: %s points, payload %.0f KB', filename, df.shape[0], entry[3] / 1024)
+
+        with self._lock:
+            self.misses += 1
+            self._figures[filename] = entry
+            self._figures.move_to_end(filename)
+            while len(self._figures) > self.maxsize:
+                self._figures.popitem(last=False)
+
+        return entry
+
+    def get(self, filename: str) -> dict:
+        return self._entry(filename)[2]
+
+    def frame(self, filename: str) -> pd.DataFrame:
+        """Data frame of the figure"""
+        return self._entry(filename)[1]
+
+    def payload(self, filename: str) -> int:
+        """Size of the figure json in bytes"""
+        return self._entry(filename)[3]
+
+    def warm(self, filenames: Iterable[str]) -> None:
+        for filename in filenames:
+            if os.path.isfile(filename):
+                self.get(filename)
+
+
+def plot_filename(top: str, alg: str) -> str:
+    """plot_df file of dropdown values"""
 
-@app.callback(
-    Output("scatter-plot", "figure"), 
-    Input("top-dropdown", "value"),
-    Input("alg-dropdown", "value"))
-def update_bar_chart(top: str, alg: str):
     n = 'none'
     a = 'tnse'
 
@@ -102,9 +181,114 @@ def update_bar_chart(top: str, alg: str):
     else:
         raise ValueError('alg parametr invalid')
 
-    df_plot_skill = pd.read_csv(f'data/plot_df/{a}-{n}-{top}-skill.csv')
-    fig = plot_skill_map(df_plot_skill, width=1200, height=750)
-    return fig 
+    return os.path.join(PLOT_DF_FOLDER, f'{a}-{n}-{top}-skill.csv')
+
+# def plot_prof_map(df: pd.DataFrame, width=1000, height=600) -> plotly.graph_objs.Figure:
+    
+#     fig = px.scatter(df, x='x', y='y',
+#         color='Профессия', hover_name='Навык', 
+#         hover_data= {'x':False, 'y':False, 'size':False, 'Профессия': False},
+#         title = None, width=width, height=height)
+
+#     fig.update_traces(marker=dict(size=20, line=dict(width=0.5, color='DarkSlateGrey')), 
+#                       selector=dict(mode='markers'))
+
+#     fig.update_xaxes(visible=False)
+#     fig.update_yaxes(visible=False)
+
+#     return fig
+
+# production: gunicorn --config gunicorn.conf.py web:server
+server = Flask(__name__)
+app = Dash(__name__, server=server)
+# figure payloads are compressed by brotli (if the browser supports it) or gzip,
+#  Dash(compress=True) allows gzip only
+server.config.update(COMPRESS_ALGORITHM=['br', 'gzip'], COMPRESS_MIN_SIZE=500, COMPRESS_LEVEL=6, COMPRESS_BR_LEVEL=4)
+Compress(server)
+
+# all variants are built at startup
+figure_cache = FigureCache(lambda df: plot_skill_map(df, width=1200, height=750))
+figure_cache.warm([os.path.join(PLOT_DF_FOLDER, 'best.csv')] + 
+                  [plot_filename(top, alg) for top in TOP_OPTIONS for alg in ALG_OPTIONS])
+
+fig = figure_cache.get(os.path.join(PLOT_DF_FOLDER, 'best.csv'))
+
+# full view of the landscape is cached, zoomed views are decimated on the fly
+def plot_landscape(df: pd.DataFrame, x_range: tuple = None, y_range: tuple = None) -> plotly.graph_objs.Figure:
+    fig = plot_skill_map(decimate(df, LOD_MAX_POINTS, x_range, y_range), width=1200, height=750, webgl=True)
+    # keep zoom of the user between updates
+    fig.update_layout(uirevision='landscape')
+    if x_range is not None:
+        fig.update_xaxes(range=x_range)
+    if y_range is not None:
+        fig.update_yaxes(range=y_range)
+    return fig
+
+landscape_cache = FigureCache(plot_landscape, maxsize=1)
+landscape_cache.warm([LANDSCAPE_FILENAME])
+
+app.layout = html.Div([
+    html.H4('Интерактивная карта навыков (можно выбрать разные режимы в выпающих списках и кликать категории в легенде)'),
+    # dcc.Dropdown(TOP_OPTIONS, TOP_OPTIONS[1], id='top-dropdown'),
+    # dcc.Dropdown(ALG_OPTIONS, ALG_OPTIONS[0], id='alg-dropdown'),
+    # dcc.Graph(id="scatter-plot"),
+
+    dcc.Graph(id="scatter-plot", figure=fig),
+
+] + ([
+    html.H4('Карта всех навыков (при приближении появляются более редкие навыки)'),
+    dcc.Graph(id="landscape-plot", figure=landscape_cache.get(LANDSCAPE_FILENAME)),
+    html.Div(id="landscape-info"),
+] if os.path.isfile(LANDSCAPE_FILENAME) else []))
+
+
+
+@app.callback(
+    Output("scatter-plot", "figure"), 
+    Input("top-dropdown", "value"),
+    Input("alg-dropdown", "value"))
+def update_bar_chart(top: str, alg: str):
+    return figure_cache.get(plot_filename(top, alg))
+
+
+@app.callback(
+    Output("landscape-plot", "figure"),
+    Output("landscape-info", "children"),
+    Input("landscape-plot", "relayoutData"))
+def update_landscape(relayout_data: dict):
+    df = landscape_cache.frame(LANDSCAPE_FILENAME)
+    x_range, y_range = view_ranges(relayout_data)
+
+    if x_range is None and y_range is None:
+        figure = landscape_cache.get(LANDSCAPE_FILENAME)
+        size = landscape_cache.payload(LANDSCAPE_FILENAME)
+    else:
+        figure = json.loads(plot_landscape(df, x_range, y_range).to_json())
+        size = payload_size(figure)
+
+    points = sum(len(trace['x']) for trace in figure['data'])
+    return figure, f'Навыков на экране: {points} из {df.shape[0]}, размер данных {size / 1024:.0f} KB'
+
+# layout and dependencies change only on restart, component scripts are versioned by dash
+CACHED_PATHS = {'/_dash-layout': 300, '/_dash-dependencies': 300, '/': 60}
+
+@server.after_request
+def add_cache_headers(response):
+    if request.method == 'GET' and response.status_code == 200:
+        max_age = CACHED_PATHS.get(request.path)
+        if max_age is not None:
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            response.add_etag()
+            response.make_conditional(request)
+    elif request.path == '/_dash-update-component':
+        response.cache_control.no_store = True
+    return response
+
+@server.route('/healthz')
+def healthz():
+    return jsonify(status='ok', pid=os.getpid(), figures=len(figure_cache),
+                   hits=figure_cache.hits, misses=figure_cache.misses)
 
 if __name__ == '__main__':
     print('start from main front')
@@ -30,7 +30,7 @@ import random
 import re
 import requests
 from src.data.abstract import Vacancy
-from src.utils import config
+from src.utils import config, list_encoding
 from src.utils.logger import configurate_logger
 from src.utils.currency_exchange import fetch_exchange_rates
 import time
@@ -177,6 +177,7 @@ class ParserApiHH:
 
         filename = f"{datetime.today().strftime('%Y-%m-%d')}-IDS.csv"
         filename = os.path.join(self._config.data_path, filename)
+        df = df.assign(query=list_encoding.encode_column(df['query']))
         df.to_csv(filename, index=False)
 
     def load_vacancies_ids(self, filename: str = None) -> Tuple[pd.DataFrame, str]:
@@ -322,7 +323,7 @@ class ParserApiHH:
         publish_city_str = get_text(soup.find(['p'], class_='vacancy-creation-time-redesigned'))
 
         s = soup.findAll(attrs={'data-qa': 'bloko-tag__text'})
-        skills = str([el.text for el in s]) if s is not None else []
+        skills = [el.text for el in s] if s is not None else []
 
         salary, salary_from, salary_to = self._parse_salary(salary_row)
 
@@ -368,7 +369,10 @@ class ParserApiHH:
             if v is not None:
                 data.append(v)
 
-        pd.DataFrame(data).to_csv(filename, index=False, encoding='utf-8')
+        df = pd.DataFrame(data)
+        for column in [x for x in list_encoding.LIST_COLUMNS if x in df.columns]:
+            df[column] = list_encoding.encode_column(df[column])
+        df.to_csv(filename, index=False, encoding='utf-8')
 
         log.info('Processed chunk %s. Total vacancies %s of %s',
                  chunk_no, len(data), df.shape[0])
@@ -28,9 +28,10 @@ Exsample of using:
 from dataclasses import dataclass, asdict
 import os
 from src.data.abstract import Vacancy
+from src.utils import list_encoding, parallel
 from src.utils.logger import configurate_logger
 from src.data.filtring import RelevantVacancyClassifier
-from typing import Union
+from typing import Dict, Tuple, Union
 import pandas as pd
 from natasha import DatesExtractor, MorphVocab, AddrExtractor
 from datetime import date
@@ -55,6 +56,11 @@ class Preprocessor:
         expected_columns = asdict(Vacancy()).keys()
         if not all([x in df.columns for x in expected_columns]):
             raise ValueError(f'Not all colums exists in file {filename}, expected columns {expected_columns}')
+
+        # files parsed before canonical list encoding contain python repr of lists
+        for column in list_encoding.LIST_COLUMNS:
+            df[column] = list_encoding.encode_column(df[column])
+
         return df
 
     def load_from_folder(self) -> Union[pd.DataFrame, None]:
@@ -142,10 +148,10 @@ class Preprocessor:
                                 ascending=[True, False, False]). \
                         groupby('description', as_index=False).first()
     
-    def generate_lemm(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Add columns:
-            - name_lemm
-            - description_lemm
+    def lemmatize_texts(self, df: pd.DataFrame) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+            Lemmatize unique names and descriptions
+            Returns dictionaries name -> lemmatized name, description -> lemmatized description
             """
 
         m = Mystem()
@@ -166,33 +172,57 @@ class Preprocessor:
             return ' '.join(lemmas)
         
         log.info('Lemmatize name...')
-        df['name_lemm'] = df.name.progress_apply(lemmatize)
+        names = {x: lemmatize(x) for x in tqdm(df.name.unique())}
 
         log.info('Lemmatize description...')
-        df['description_lemm'] = df.description.progress_apply(lemmatize)
+        descriptions = {x: lemmatize(x) for x in tqdm(df.description.unique())}
+
+        return names, descriptions
+
+    def generate_lemm(self, df: pd.DataFrame, lemmas: Tuple[Dict[str, str], Dict[str, str]] = None) -> pd.DataFrame:
+        """Add columns:
+            - name_lemm
+            - description_lemm
+            lemmas: result of lemmatize_texts, calculated if None
+            """
+
+        names, descriptions = lemmas or self.lemmatize_texts(df)
+        df['name_lemm'] = df.name.map(names)
+        df['description_lemm'] = df.description.map(descriptions)
 
         log.info('Lemmatization finished')
 
         return df
 
+    def _features_branch(self, df: pd.DataFrame) -> pd.DataFrame:
+        """extract_features and drop_text_duplicates"""
+        return self.drop_text_duplicates(self.extract_features(df))
+
     def save_df(self, df: pd.DataFrame) -> None:
         """ save resulted dataframe to file"""
         filename = os.path.join(self.result_data_folder, 'vacancies.csv')
         df.to_csv(filename, index=False, encoding='utf-8')
         log.info('Saved to "%s" file', filename)
  
-    def process(self) -> pd.DataFrame:
+    def process(self, max_workers: int = None) -> pd.DataFrame:
         """
             Extract: from row_data_folder
             Transform: cleaning and creating few simple new features
             Load: save to result_data_folder to 'vacancies.csv' file
+
+            Feature extraction and lemmatization are independent and run on a process pool
+            max_workers: process pool size, 1 for sequential run
             """
         df = self.load_from_folder()
         df = self.data_cleaning(df)
         df = self.filtering(df)
-        df = self.extract_features(df)
-        df = self.drop_text_duplicates(df)    
-        df = self.generate_lemm(df)
+
+        # lemmas depend only on texts (deduplication is by description), so they are joined after it
+        results = parallel.run_tasks({
+            'features': (self._features_branch, (df,)),
+            'lemm': (self.lemmatize_texts, (df[['name', 'description']],)),
+        }, max_workers)
+        df = self.generate_lemm(results['features'], results['lemm'])
 
         log.info('Dataframe shape = %s', df.shape)
 
@@ -1,19 +1,98 @@
-from src.data.ParserApiHH import ParserApiHH
-from src.data.ParserApiHH import ParserConfig
+"""
+Data pipeline: hh parsing -> preprocessing -> features
+
+Stages are run by src.utils.pipeline, up-to-date stages are skipped:
+    - ids: collect new vacancy ids (once a day)
+    - vacancies: fetch vacancies of the ids file
+    - preprocessing: 'data/processed/vacancies.csv'
+    - features: 'data/features'
+    - embeddings: skill and profession embeddings, 'data/plot_df' files of the front
+    - layout: t-SNE layouts of 'data/plot_df' files, warm start from the previous layouts
+
+Exsample of using:
+
+    python -m src.data_pipeline
+    # force stages (positional arguments), 'all' for every stage
+    python -m src.data_pipeline features
+    python -m src.data_pipeline --log=INFO all
+
+"""
+
+from datetime import datetime
+import glob
+import os
+import sys
+import pandas as pd
+from src.data.ParserApiHH import ParserApiHH, ParserConfig, SETTINGS_PATH
 from src.data.preprocessing import Preprocessor
+from src.features.embeddings import embeddings_processing
 from src.features.features_processor import FeaturesProcessor
+from src.features.layout import layout_processing
+from src.utils import config
+from src.utils.pipeline import Pipeline, Stage
+
+
+def csv_rows(*patterns: str) -> int:
+    """Count of rows of csv files (only the first column is parsed)"""
+    return sum(pd.read_csv(fn, usecols=[0]).shape[0] for p in patterns for fn in sorted(glob.glob(p)))
+
+
+def build_pipeline() -> Pipeline:
+
+    parser_config : ParserConfig = config.load(SETTINGS_PATH) or ParserConfig()
+    hh_folder = parser_config.data_path
+    today = datetime.today().strftime('%Y-%m-%d')
+    ids_filename = os.path.join(hh_folder, f'{today}-IDS.csv')
+
+    def collect_ids():
+        dc = ParserApiHH()
+        dc.process_ids(dc.get_parsed_ids())
+
+    def fetch_vacancies():
+        dc = ParserApiHH()
+        df, filename = dc.load_vacancies_ids()
+        dc.process_vacancies_chunked(df, filename, specify_chunks=None)
+
+    return Pipeline([
+        Stage('ids', collect_ids,
+              inputs=[SETTINGS_PATH], outputs=[ids_filename],
+              params={'date': today},
+              rows=lambda: csv_rows(ids_filename)),
+        Stage('vacancies', fetch_vacancies, deps=['ids'],
+              inputs=[ids_filename], outputs=[ids_filename.replace('IDS.csv', 'DATA-*.csv')],
+              code=['src/data/ParserApiHH.py'],
+              rows=lambda: csv_rows(ids_filename.replace('IDS.csv', 'DATA-*.csv'))),
+        Stage('preprocessing', lambda: Preprocessor().process(), deps=['vacancies'],
+              inputs=[os.path.join(hh_folder, '*-DATA-*.csv'), 'models/RelevantVacancyClassifier.pkl'],
+              outputs=['data/processed/vacancies.csv'],
+              code=['src/data/preprocessing.py', 'src/data/filtring.py', 'src/utils/list_encoding.py'],
+              rows=lambda: csv_rows('data/processed/vacancies.csv')),
+        Stage('features', lambda: FeaturesProcessor().process(), deps=['preprocessing'],
+              inputs=['data/processed/vacancies.csv', 'cnf/professions.json', 'cnf/profession_rules.json',
+                      'cnf/skill_aliases.json'],
+              outputs=['data/features/skills.csv', 'data/features/prof.csv', 'data/features/feature_store.json'],
+              code=['src/features/*.py', 'src/utils/quantile_sketch.py', 'src/utils/list_encoding.py'],
+              rows=lambda: csv_rows('data/features/skills.csv')),
+        Stage('embeddings', lambda: embeddings_processing('data/features', 'data/plot_df'), deps=['features'],
+              inputs=['data/features/skills.csv', 'data/features/matrix.npy'],
+              outputs=['data/plot_df/als-skill-50-skill.csv', 'data/features/skill_embeddings.npy'],
+              code=['src/features/embeddings.py'],
+              rows=lambda: csv_rows('data/plot_df/als-skill-50-skill.csv')),
+        Stage('layout', lambda: layout_processing('data/features', 'data/plot_df'), deps=['embeddings'],
+              inputs=['data/features/skills.csv', 'data/features/matrix.npy', 'data/features/skill_embeddings.npy'],
+              outputs=['data/plot_df/landscape.csv', 'data/plot_df/layout-*.csv'],
+              code=['src/features/layout.py', 'src/features/embeddings.py'],
+              rows=lambda: csv_rows('data/plot_df/landscape.csv')),
+    ])
+
 
-# hh parsing
-dc = ParserApiHH()
-# this is a FIRST stage
-parsed_ids = dc.get_parsed_ids()
-dc.process_ids(parsed_ids)
-# this is a SECOND stage
-df, filename = dc.load_vacancies_ids()
-dc.process_vacancies_chunked(df, filename, specify_chunks=None)
+if __name__ == '__main__':
 
-# proprocessing
-Preprocessor().process()
+    # positional arguments: forced stages (command-line options are parsed by logger)
+    force = [x for x in sys.argv[1:] if not x.startswith('--')]
 
-# features
-FeaturesProcessor().process()
+    pipeline = build_pipeline()
+    try:
+        pipeline.run(force=force)
+    finally:
+        print(pipeline.report_str())
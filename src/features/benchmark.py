@@ -0,0 +1,216 @@
+"""
+Benchmark and equivalence check of feature processing on a synthetic corpus
+
+Synthetic vacancies are generated from config files (skill aliases, professions, rules)
+with the size of the current corpus multiplied by scale.
+
+Checks:
+    - relationship matrix: vectorized (sparse) vs reference triple-nested loop
+    - professions: every query (quoted as hh queries are) is mapped to a profession of config files
+    - incremental processing: full processing of the first half of vacancies, then incremental
+      processing of all vacancies vs full processing of all vacancies.
+      Skill names, frequencies and the matrix must be equal, salary quantiles (sketches)
+      must be within QUANTILE_TOLERANCE of exact ones
+
+Exsample of using:
+
+    python -m src.features.benchmark
+    python -m src.features.benchmark 10
+
+"""
+
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+from src.utils import config, list_encoding
+from src.features import feature_store
+from src.features.features_processor import FeaturesProcessor
+
+# size of the current corpus
+CORPUS_SIZE = 3339
+# maximum relative error of incremental (sketch) salary quantiles
+QUANTILE_TOLERANCE = 0.05
+SALARY_COLUMNS = ['salary_q25', 'salary_q50', 'salary_q75']
+
+
+def generate_vacancies(rows: int, config_folder: str = 'cnf', seed: int = 42) -> pd.DataFrame:
+    """Generate synthetic 'vacancies.csv' like dataframe"""
+
+    rng = np.random.default_rng(seed)
+
+    skill_aliases = config.load(os.path.join(config_folder, 'skill_aliases.json'))
+    skills = np.array(sorted({s for group in skill_aliases for s in group}))
+    # queries of hh parser are quoted ('"data scientist"'), unquoted ones are generated too
+    queries = np.array([x['query_name'] for x in config.load(os.path.join(config_folder, 'professions.json'))])
+    queries = np.concatenate([queries, np.char.add(np.char.add('"', queries), '"')])
+    names = np.array([kw for x in config.load(os.path.join(config_folder, 'profession_rules.json'))
+                      for kw in x['keywords']] + ['Программист', 'Менеджер проектов'])
+
+    # skill popularity is heavy tailed
+    skill_p = 1 / np.arange(1, skills.shape[0] + 1) ** 0.8
+    skill_p /= skill_p.sum()
+
+    skill_counts = rng.integers(1, 15, rows)
+    query_counts = rng.integers(1, 3, rows)
+    salary = rng.random(rows) < 0.4
+    salary_from = rng.integers(50, 400, rows) * 1000.0
+    salary_to = salary_from + rng.integers(0, 150, rows) * 1000.0
+    start = np.datetime64('2023-03-01')
+
+    return pd.DataFrame({
+        'vacancy_id': np.arange(rows) + 70_000_000,
+        'name': np.char.add(rng.choice(names, rows), rng.choice(['', ' (Middle)', ' / Senior'], rows)),
+        'salary': salary,
+        'salary_from': np.where(salary, salary_from, np.nan),
+        'salary_to': np.where(salary, salary_to, np.nan),
+        'skills': [list_encoding.encode_list(rng.choice(skills, n, replace=False, p=skill_p)) for n in skill_counts],
+        'query': [list_encoding.encode_list(rng.choice(queries, n, replace=False)) for n in query_counts],
+        'publish_date': (start + rng.integers(0, 90, rows)).astype(str),
+    })
+
+
+def _config_professions(config_folder: str = 'cnf') -> set:
+    """Professions of professions.json and profession_rules.json"""
+
+    return {x['profession'] for fn in ['professions.json', 'profession_rules.json']
+            for x in config.load(os.path.join(config_folder, fn))}
+
+
+def rel_matrix_reference(df: pd.DataFrame, skill_original_to_index: Dict[str, int],
+                         prof_index_to_prof_name: Dict[int, str]) -> np.array:
+    """Reference skill-profession matrix: triple-nested loop over rows, professions and skills"""
+
+    prof_to_index = {v: k for k, v in prof_index_to_prof_name.items()}
+    skills_count = max(skill_original_to_index.values()) + 1
+
+    matrix = np.zeros((skills_count, len(prof_index_to_prof_name)))
+    for row in df[['prof_set', 'skill_set']].to_numpy():
+        for prof in row[0]:
+            prof_id = prof_to_index[prof]
+            for skill in row[1]:
+                skill_id = skill_original_to_index[skill]
+                matrix[skill_id, prof_id] += 1
+
+    return matrix
+
+
+def _named_features(folder: str) -> Tuple[Dict[str, str], pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Features indexed by names (indices of full and incremental processing differ)"""
+
+    fs = feature_store.open_store(folder, mmap=False)
+    skill_names, prof_names = fs.skill_names.to_list(), fs.prof_names.to_list()
+    corrected = {k: skill_names[v] for k, v in fs.skill_original_to_index.items()}
+    matrix = pd.DataFrame(fs.matrix, index=skill_names, columns=prof_names).sort_index().sort_index(axis=1)
+    skill_df = pd.read_csv(os.path.join(folder, 'skills.csv')).set_index('skill_name').sort_index()
+    prof_df = pd.read_csv(os.path.join(folder, 'prof.csv')).set_index('prof_name').sort_index()
+
+    return corrected, matrix, skill_df, prof_df
+
+
+def _check_features_df(title: str, df: pd.DataFrame, reference: pd.DataFrame) -> float:
+    """Check frequencies and salary quantiles of the same entities, returns max relative error of quantiles"""
+
+    if not df.index.equals(reference.index):
+        raise AssertionError(f'{title}: names differ from full processing')
+    if not np.allclose(df['frequency'], reference['frequency']):
+        raise AssertionError(f'{title}: frequencies differ from full processing')
+    if not df[SALARY_COLUMNS].isna().equals(reference[SALARY_COLUMNS].isna()):
+        raise AssertionError(f'{title}: salary quantiles are calculated for other entities')
+
+    error = ((df[SALARY_COLUMNS] - reference[SALARY_COLUMNS]).abs() / reference[SALARY_COLUMNS]).max().max()
+    error = 0.0 if pd.isna(error) else float(error)
+    if error > QUANTILE_TOLERANCE:
+        raise AssertionError(f'{title}: salary quantiles error {error:.3f} > {QUANTILE_TOLERANCE}')
+
+    return error
+
+
+def check_incremental(df: pd.DataFrame, folder: str, config_folder: str = 'cnf',
+                      timings: Dict[str, float] = None) -> float:
+    """
+        Compare incremental processing (first half, then all vacancies) with full processing of all vacancies
+        Returns max relative error of salary quantiles
+    """
+
+    timings = {} if timings is None else timings
+    full_folder, part_folder, inc_folder = [os.path.join(folder, x) for x in ['full', 'part', 'inc']]
+    for x in [full_folder, part_folder, inc_folder]:
+        os.makedirs(x)
+    df.to_csv(os.path.join(full_folder, 'vacancies.csv'), index=False, encoding='utf-8')
+    df.iloc[:df.shape[0] // 2].to_csv(os.path.join(part_folder, 'vacancies.csv'), index=False, encoding='utf-8')
+
+    with timer('process', timings):
+        FeaturesProcessor(data_folder=full_folder, features_folder=full_folder, config_folder=config_folder).process()
+    FeaturesProcessor(data_folder=part_folder, features_folder=inc_folder, config_folder=config_folder).process()
+    with timer('process_incremental', timings):
+        FeaturesProcessor(data_folder=full_folder, features_folder=inc_folder,
+                          config_folder=config_folder).process_incremental()
+
+    corrected, matrix, skill_df, prof_df = _named_features(inc_folder)
+    ref_corrected, ref_matrix, ref_skill_df, ref_prof_df = _named_features(full_folder)
+
+    if corrected != ref_corrected:
+        raise AssertionError('Incremental skill names differ from full processing')
+    if not matrix.equals(ref_matrix):
+        raise AssertionError('Incremental relationship matrix differs from full processing')
+
+    return max(_check_features_df('Incremental skills', skill_df, ref_skill_df),
+               _check_features_df('Incremental professions', prof_df, ref_prof_df))
+
+
+@contextmanager
+def timer(title: str, timings: Dict[str, float]):
+    start = time.perf_counter()
+    yield
+    timings[title] = time.perf_counter() - start
+
+
+def run(scale: float = 1.0, config_folder: str = 'cnf') -> Tuple[Dict[str, float], float]:
+    """
+        Process synthetic corpus, check equivalence
+        Returns timings in seconds and max relative error of incremental salary quantiles
+    """
+
+    timings = {}
+    with tempfile.TemporaryDirectory() as folder:
+        df = generate_vacancies(int(CORPUS_SIZE * scale), config_folder)
+        df.to_csv(os.path.join(folder, 'vacancies.csv'), index=False, encoding='utf-8')
+
+        fp = FeaturesProcessor(data_folder=folder, features_folder=folder, config_folder=config_folder)
+        with timer('skills_processing', timings):
+            fp.skills_processing()
+        with timer('professions_processing', timings):
+            fp.professions_processing()
+        with timer('rel_matrix_processing', timings):
+            matrix = fp.rel_matrix_processing()
+        with timer('rel_matrix_reference', timings):
+            reference = rel_matrix_reference(fp.df, fp.skill_original_to_index, fp.prof_index_to_prof_name)
+
+        if not np.array_equal(matrix, reference):
+            raise AssertionError('Relationship matrix differs from the reference')
+
+        unknown = set(fp.prof_index_to_prof_name.values()) - _config_professions(config_folder)
+        if len(unknown) > 0:
+            raise AssertionError(f'Queries are not mapped to professions: {sorted(unknown)[:5]}')
+
+        quantile_error = check_incremental(df, os.path.join(folder, 'incremental'), config_folder, timings)
+
+    return timings, quantile_error
+
+
+if __name__ == '__main__':
+
+    # positional arguments: scales (command-line options are parsed by logger)
+    scales = [float(x) for x in sys.argv[1:] if not x.startswith('--')] or [1, 10]
+
+    for scale in scales:
+        timings, quantile_error = run(scale)
+        print(f'scale={scale:g} ({int(CORPUS_SIZE * scale)} vacancies), matrix is equal to the reference, '
+              f'incremental processing is equal to full (salary quantiles error {quantile_error:.4f})')
+        for k, v in timings.items():
+            print(f'    {k:<25} {v:8.3f} s')
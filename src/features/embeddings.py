@@ -0,0 +1,314 @@
+"""
+Embeddings of skills and professions (Es, Ef of the design doc)
+
+Relationship matrix A (skill x profession 'matrix' of the feature store, or sparse vacancy x skill)
+is approximated by A ~ rows @ cols.T:
+    - 'svd': truncated randomized SVD (Halko et al.), rows = U * sqrt(S), cols = V * sqrt(S).
+             Power iterations stop early when singular values are stable
+    - 'als': alternating least squares with L2 regularization, every step is one
+             sparse-dense product and a small linear system (BLAS, multithreaded).
+             Stops early when the relative improvement of the loss is below tol
+
+Reconstruction metric (0..1): mean nDCG@K of rankings by rows @ cols.T against rankings by A,
+for both directions (skills of a profession and professions of a skill).
+
+Plot files for the front ('data/plot_df' by default, columns of the notebook files):
+    - '<alg>-<norm>-<top>-skill.csv': [, x, y, skill_id, Навык, Профессия, size] top skills of every profession
+    - '<alg>-<norm>-<top>-prof.csv': [, x, y, Профессия]
+Coordinates are the first two principal components of embeddings of PLOT_VARIANTS.
+Files of EMBEDDINGS_VARIANT and t-SNE layouts (and 'landscape.csv' of all skills) are made by layout.py,
+so every plot file has one writer.
+
+Embeddings of EMBEDDINGS_VARIANT are saved to feature store 'skill_embeddings', 'prof_embeddings'.
+
+Exsample of using:
+
+    fs = feature_store.open_store('data/features')
+    A = normalize_matrix(fs.matrix, 'skill')
+    emb = als(A, rank=8)
+    reconstruction_ndcg(A, emb.rows, emb.cols, k=10)
+
+    embeddings_processing('data/features', 'data/plot_df')
+
+    # fit time and metrics
+    python -m src.features.embeddings data/features
+
+"""
+
+from dataclasses import dataclass, field
+import os
+import sys
+import time
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from threadpoolctl import threadpool_limits
+from src.features import feature_store
+from src.utils.logger import configurate_logger
+
+log = configurate_logger('Embeddings')
+
+NORM_TYPES = ['none', 'skill', 'prof']
+PLOT_TOPS = [50, 100, 200]
+# (algorithm, normalization) of the feature store embeddings, 'skill' normalized als is the best map of the notebooks
+EMBEDDINGS_VARIANT = ('als', 'skill')
+# (algorithm, normalization) of plot files of principal components
+PLOT_VARIANTS = [('svd', 'skill'), ('als', 'none')]
+
+
+@dataclass
+class Embeddings:
+    rows : np.ndarray
+    cols : np.ndarray
+    algorithm : str = ''
+    iterations : int = 0
+    # loss (als) or relative change of singular values (svd) of every iteration
+    history : List[float] = field(default_factory=lambda: [])
+
+
+def normalize_matrix(matrix: np.ndarray, norm_type: str = 'none') -> np.ndarray:
+    """
+        Normalization of skill x profession matrix
+        'none' - counts, 'skill' - every skill (row) sums to 1, 'prof' - every profession (column) sums to 1
+    """
+
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if norm_type == 'skill':
+        sums = matrix.sum(axis=1, keepdims=True)
+    elif norm_type == 'prof':
+        sums = matrix.sum(axis=0, keepdims=True)
+    elif norm_type == 'none':
+        return matrix
+    else:
+        raise ValueError(f"norm_type parametr must be one of {NORM_TYPES}")
+
+    return matrix / np.where(sums > 0, sums, 1)
+
+
+def _max_rank(A, rank: int) -> int:
+    return max(1, min(rank, min(A.shape) - 1))
+
+
+def randomized_svd(A, rank: int = 8, n_oversamples: int = 10, max_iter: int = 10,
+                   tol: float = 1e-4, seed: int = 0) -> Embeddings:
+    """Truncated SVD of dense or sparse A by randomized range finder with power iterations"""
+
+    rank = _max_rank(A, rank)
+    rng = np.random.default_rng(seed)
+    n_components = min(rank + n_oversamples, min(A.shape))
+
+    Q, _ = np.linalg.qr(A @ rng.normal(size=(A.shape[1], n_components)))
+    # max_iter=0: range finder without power iterations
+    S_prev, history, iteration = None, [], 0
+    for iteration in range(1, max_iter + 1):
+        Q, _ = np.linalg.qr(A.T @ Q)
+        Q, _ = np.linalg.qr(A @ Q)
+
+        S = np.linalg.svd(np.asarray((A.T @ Q).T), compute_uv=False)[:rank]
+        if S_prev is not None:
+            history.append(float(np.max(np.abs(S - S_prev) / np.maximum(S, 1e-12))))
+            if history[-1] < tol:
+                break
+        S_prev = S
+
+    U, S, Vt = np.linalg.svd(np.asarray((A.T @ Q).T), full_matrices=False)
+    U, S, Vt = Q @ U[:, :rank], S[:rank], Vt[:rank]
+
+    return Embeddings(U * np.sqrt(S), Vt.T * np.sqrt(S), 'svd', iteration, history)
+
+
+def _als_loss(A, A_norm2: float, rows: np.ndarray, cols: np.ndarray, reg: float) -> float:
+    """||A - rows @ cols.T||^2 + reg * (||rows||^2 + ||cols||^2) without dense reconstruction"""
+
+    cross = np.sum(np.asarray(A @ cols) * rows)
+    return A_norm2 - 2 * cross + np.sum((rows.T @ rows) * (cols.T @ cols)) + \
+        reg * (np.sum(rows ** 2) + np.sum(cols ** 2))
+
+
+def als(A, rank: int = 8, reg: float = 0.01, max_iter: int = 50, tol: float = 1e-4, seed: int = 0) -> Embeddings:
+    """Alternating least squares of dense or sparse A"""
+
+    if max_iter < 1:
+        raise ValueError(f'max_iter must be at least 1, got {max_iter}')
+
+    rank = _max_rank(A, rank)
+    A = sparse.csr_matrix(A, dtype=np.float64) if sparse.issparse(A) else np.asarray(A, dtype=np.float64)
+    At = A.T.tocsr() if sparse.issparse(A) else A.T
+    A_norm2 = float(A.multiply(A).sum()) if sparse.issparse(A) else float(np.sum(A ** 2))
+
+    rng = np.random.default_rng(seed)
+    cols = rng.normal(scale=1 / np.sqrt(rank), size=(A.shape[1], rank))
+    ridge = reg * np.eye(rank)
+
+    history = []
+    for iteration in range(1, max_iter + 1):
+        rows = np.linalg.solve(cols.T @ cols + ridge, np.asarray(A @ cols).T).T
+        cols = np.linalg.solve(rows.T @ rows + ridge, np.asarray(At @ rows).T).T
+
+        history.append(_als_loss(A, A_norm2, rows, cols, reg))
+        if len(history) > 1 and history[-2] - history[-1] < tol * max(history[-2], 1e-12):
+            break
+
+    return Embeddings(rows, cols, 'als', iteration, history)
+
+
+def _ndcg_rows(A: sparse.csr_matrix, rows: np.ndarray, cols: np.ndarray, k: int,
+               max_rows: int, rng: np.random.Generator) -> float:
+    """Mean nDCG@k of rankings of every nonzero row of A"""
+
+    ids = np.flatnonzero(A.getnnz(axis=1) > 0)
+    if ids.shape[0] > max_rows:
+        ids = np.sort(rng.choice(ids, max_rows, replace=False))
+    if ids.shape[0] == 0:
+        return 0.0
+
+    true = A[ids].toarray()
+    pred = rows[ids] @ cols.T
+    k = min(k, true.shape[1])
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+
+    top = np.argpartition(-pred, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(pred, top, axis=1), axis=1), axis=1)
+    dcg = np.take_along_axis(true, top, axis=1) @ discounts
+    ideal = -np.sort(-true, axis=1)[:, :k] @ discounts
+
+    return float(np.mean(dcg / ideal))
+
+
+def reconstruction_ndcg(A, rows: np.ndarray, cols: np.ndarray, k: int = 10,
+                        max_rows: int = 2000, seed: int = 0) -> float:
+    """
+        Reconstruction metric 0..1: mean of nDCG@k of rows and columns of A ranked by rows @ cols.T
+        max_rows: sample of rows (columns) for big matrices
+    """
+
+    A = sparse.csr_matrix(A, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    return (_ndcg_rows(A, rows, cols, k, max_rows, rng) + _ndcg_rows(A.T.tocsr(), cols, rows, k, max_rows, rng)) / 2
+
+
+def fit(A, algorithm: str = 'als', rank: int = 8, threads: int = None, **params) -> Embeddings:
+    """Embeddings by algorithm ('als', 'svd'), threads: BLAS threads, all cores by default"""
+
+    algorithms = {'als': als, 'svd': randomized_svd}
+    if algorithm not in algorithms:
+        raise ValueError(f'Unknown algorithm "{algorithm}", expected one of {list(algorithms)}')
+
+    with threadpool_limits(limits=threads, user_api='blas'):
+        return algorithms[algorithm](A, rank, **params)
+
+
+def project_2d(vectors: np.ndarray) -> np.ndarray:
+    """First two principal components"""
+
+    centered = vectors - vectors.mean(axis=0)
+    _, _, Vt = np.linalg.svd(centered, full_matrices=False)
+    xy = centered @ Vt[:2].T
+    return np.hstack([xy, np.zeros((xy.shape[0], 2 - xy.shape[1]))]) if xy.shape[1] < 2 else xy
+
+
+def skill_plot_df(skill_df: pd.DataFrame, skill_xy: np.ndarray, prof_names: List[str], top_n: int) -> pd.DataFrame:
+    """
+        Skill map dataframe: top_n skills of every profession by share (columns of skills.csv),
+        a skill of several professions has a point for each of them.
+        size: share of the skill normalized to the range of top skills of the profession
+    """
+
+    shares = skill_df.set_index('skill_id')[prof_names]
+    tops = {p: shares[p].sort_values(ascending=False, kind='stable').head(top_n) for p in prof_names}
+
+    # point index: order of skills in the first profession which has it
+    selected = pd.unique(np.concatenate([top.index.to_numpy() for top in tops.values()]))
+    names = skill_df.set_index('skill_id').skill_name
+    points = pd.DataFrame({'x': skill_xy[selected, 0], 'y': skill_xy[selected, 1],
+                           'skill_id': selected, 'Навык': names.loc[selected].to_numpy()})
+
+    frames = []
+    for p, top in tops.items():
+        min_f, max_f = top.min(), top.max()
+        if max_f - min_f < 1e-10:
+            max_f += 1
+        df = points[points.skill_id.isin(top.index)].copy()
+        df['Профессия'] = p
+        df['size'] = 15 * (top.loc[df.skill_id].to_numpy() - min_f) / (max_f - min_f) + 0.8
+        frames.append(df)
+
+    return pd.concat(frames)
+
+
+def landscape_plot_df(skill_df: pd.DataFrame, skill_xy: np.ndarray) -> pd.DataFrame:
+    """All skills map dataframe, colored by the popular profession, size by frequency"""
+
+    skill_df = skill_df.sort_values('skill_id')
+    frequency = skill_df.frequency.to_numpy()
+    return pd.DataFrame({'x': skill_xy[skill_df.skill_id, 0], 'y': skill_xy[skill_df.skill_id, 1],
+                         'skill_id': skill_df.skill_id.to_numpy(), 'Навык': skill_df.skill_name.to_numpy(),
+                         'Профессия': skill_df.popular_profession_name.to_numpy(),
+                         'size': 15 * frequency / max(frequency.max(), 1e-10) + 0.8})
+
+
+def prof_plot_df(prof_xy: np.ndarray, prof_names: List[str]) -> pd.DataFrame:
+    return pd.DataFrame({'x': prof_xy[:, 0], 'y': prof_xy[:, 1], 'Профессия': prof_names})
+
+
+def embeddings_processing(features_folder: str = 'data/features', plot_df_folder: str = 'data/plot_df',
+                          rank: int = 8, k: int = 10) -> Dict[str, float]:
+    """
+        Fit embeddings of skill x profession matrix of EMBEDDINGS_VARIANT and every plot variant,
+        save embeddings of EMBEDDINGS_VARIANT to feature store and plot files of PLOT_VARIANTS.
+        Returns reconstruction metric of every variant
+    """
+
+    fs = feature_store.open_store(features_folder)
+    matrix = np.asarray(fs.matrix)
+    prof_names = fs.prof_names.to_list()
+    skill_df = pd.read_csv(os.path.join(features_folder, 'skills.csv'))
+    os.makedirs(plot_df_folder, exist_ok=True)
+
+    metrics = {}
+    for algorithm, norm_type in [EMBEDDINGS_VARIANT] + PLOT_VARIANTS:
+        A = normalize_matrix(matrix, norm_type)
+        start = time.perf_counter()
+        emb = fit(A, algorithm, rank)
+        metrics[f'{algorithm}-{norm_type}'] = reconstruction_ndcg(A, emb.rows, emb.cols, k)
+        log.info('Embeddings %s-%s: %s iterations, %.2f s, nDCG@%s %.4f', algorithm, norm_type, emb.iterations,
+                 time.perf_counter() - start, k, metrics[f'{algorithm}-{norm_type}'])
+
+        if (algorithm, norm_type) == EMBEDDINGS_VARIANT:
+            feature_store.save_array(features_folder, 'skill_embeddings', emb.rows)
+            feature_store.save_array(features_folder, 'prof_embeddings', emb.cols)
+            continue
+
+        skill_xy, prof_xy = project_2d(emb.rows), project_2d(emb.cols)
+        for top in PLOT_TOPS:
+            skill_plot_df(skill_df, skill_xy, prof_names, top).to_csv(
+                os.path.join(plot_df_folder, f'{algorithm}-{norm_type}-{top}-skill.csv'))
+            prof_plot_df(prof_xy, prof_names).to_csv(
+                os.path.join(plot_df_folder, f'{algorithm}-{norm_type}-{top}-prof.csv'))
+
+    return metrics
+
+
+if __name__ == '__main__':
+
+    # positional arguments: features folder, plot_df folder (plot files are written only if it is set)
+    args = [x for x in sys.argv[1:] if not x.startswith('--')]
+    features_folder = args[0] if len(args) > 0 else 'data/features'
+
+    fs = feature_store.open_store(features_folder)
+    matrices = {norm_type: normalize_matrix(fs.matrix, norm_type) for norm_type in NORM_TYPES}
+    if 'matrix_vac' in fs:
+        matrices['vacancy x skill'] = fs.sparse('matrix_vac').T.tocsr()
+
+    for name, A in matrices.items():
+        for algorithm in ['als', 'svd']:
+            for rank in [2, 4, 8]:
+                start = time.perf_counter()
+                emb = fit(A, algorithm, rank)
+                seconds = time.perf_counter() - start
+                print(f'{name:<16} {algorithm} rank {rank}: {emb.iterations:3} iterations, {seconds * 1000:8.1f} ms, '
+                      f'nDCG@10 {reconstruction_ndcg(A, emb.rows, emb.cols, 10):.4f}')
+
+    if len(args) > 1:
+        print(embeddings_processing(features_folder, args[1]))
@@ -0,0 +1,300 @@
+"""
+Feature store: versioned memory-mappable binary format of feature artifacts
+
+All files are inside one folder (features_folder by default):
+    - 'feature_store.json': format version and list of stored items
+    - array '<name>': '<name>.npy'
+    - sparse csr matrix '<name>': '<name>.data.npy', '<name>.indices.npy', '<name>.indptr.npy'
+    - string table '<name>': '<name>.utf8.npy' (all strings utf-8 encoded in one blob)
+                             and '<name>.offsets.npy' (n+1 offsets in the blob)
+    - mapping string -> int '<name>': string table of keys and '<name>.values.npy'
+
+Every .npy file is opened with mmap_mode='r', so opening the store is zero-copy.
+Pages are loaded on demand and shared between processes through the OS page cache,
+so several workers reading the same store keep a single copy in memory.
+
+Items saved by FeaturesProcessor:
+    - 'matrix': skill-profession relationship matrix (numpy.array[skill_id, prof_id])
+    - 'skill_names': skill index to corrected skill name
+    - 'skill_original_to_index': skill name to index
+    - 'prof_names': prof index to prof name
+    - 'skill_pmi', 'skill_cooccurrence': skill co-occurrence graph (csr_matrix[skill_id, skill_id])
+
+Items saved by embeddings.py:
+    - 'skill_embeddings', 'prof_embeddings': numpy.array[skill_id | prof_id, factor]
+
+Exsample of using:
+
+    feature_store.save_array('data/features', 'matrix', matrix)
+
+    fs = feature_store.open_store('data/features')
+    fs.matrix[fs.skill_original_to_index['Python']]
+    fs.skill_names[10]
+    fs.sparse('matrix_vac')
+
+    # one-time conversion of old pickled artifacts
+    feature_store.migrate_pickles('data/features')
+
+"""
+
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+import json
+import os
+import pickle
+from typing import Dict, Iterable, Iterator, List
+import numpy as np
+from scipy import sparse
+
+FORMAT_VERSION = 1
+META_FILENAME = 'feature_store.json'
+
+
+def _load_meta(folder: str) -> dict:
+    filename = os.path.join(folder, META_FILENAME)
+    if not os.path.isfile(filename):
+        return {'format_version': FORMAT_VERSION, 'items': {}}
+
+    with open(filename, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+
+    if meta.get('format_version', 0) > FORMAT_VERSION:
+        raise ValueError(f'Unsupported feature store version {meta.get("format_version")} '
+                         f'(supported up to {FORMAT_VERSION}): {folder}')
+    return meta
+
+
+def _register(folder: str, name: str, kind: str, **info) -> None:
+    """Add item to store meta file. Meta file is replaced atomically"""
+
+    meta = _load_meta(folder)
+    meta['format_version'] = FORMAT_VERSION
+    meta['items'][name] = {'kind': kind, 'updated': datetime.now().isoformat(timespec='seconds'), **info}
+
+    filename = os.path.join(folder, META_FILENAME)
+    with open(filename + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=4)
+    os.replace(filename + '.tmp', filename)
+
+
+def _save_npy(folder: str, filename: str, array: np.ndarray) -> None:
+    path = os.path.join(folder, filename)
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(path + '.tmp', path)
+
+
+def _load_npy(folder: str, filename: str, mmap: bool = True) -> np.ndarray:
+    return np.load(os.path.join(folder, filename), mmap_mode='r' if mmap else None)
+
+
+def save_array(folder: str, name: str, array: np.ndarray) -> None:
+    """Save dense numpy array"""
+    _save_npy(folder, f'{name}.npy', array)
+    _register(folder, name, 'array', shape=list(array.shape), dtype=str(array.dtype))
+
+
+def save_sparse(folder: str, name: str, matrix: sparse.spmatrix) -> None:
+    """Save sparse matrix as csr components"""
+    matrix = sparse.csr_matrix(matrix)
+    _save_npy(folder, f'{name}.data.npy', matrix.data)
+    _save_npy(folder, f'{name}.indices.npy', matrix.indices)
+    _save_npy(folder, f'{name}.indptr.npy', matrix.indptr)
+    _register(folder, name, 'sparse', shape=list(matrix.shape), nnz=int(matrix.nnz), dtype=str(matrix.dtype))
+
+
+def _save_string_blob(folder: str, name: str, strings: Iterable[str]) -> int:
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(x) for x in encoded], out=offsets[1:])
+    _save_npy(folder, f'{name}.utf8.npy', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    _save_npy(folder, f'{name}.offsets.npy', offsets)
+    return len(encoded)
+
+
+def save_strings(folder: str, name: str, strings: Iterable[str]) -> None:
+    """Save list of strings (index -> string)"""
+    count = _save_string_blob(folder, name, strings)
+    _register(folder, name, 'strings', count=count)
+
+
+def save_mapping(folder: str, name: str, mapping: Dict[str, int]) -> None:
+    """Save dictionary string -> int"""
+    count = _save_string_blob(folder, name, mapping.keys())
+    _save_npy(folder, f'{name}.values.npy', np.fromiter(mapping.values(), dtype=np.int64, count=len(mapping)))
+    _register(folder, name, 'mapping', count=count)
+
+
+class StringTable(Sequence):
+    """Read-only list of strings over memory-mapped utf-8 blob"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return self._offsets.shape[0] - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[x] for x in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('StringTable index out of range')
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        blob = self._blob.tobytes()
+        offsets = self._offsets.tolist()
+        for i in range(len(self)):
+            yield blob[offsets[i]:offsets[i + 1]].decode('utf-8')
+
+    def to_list(self) -> List[str]:
+        return list(iter(self))
+
+    def to_dict(self) -> Dict[int, str]:
+        """dictionary index -> string (as pickled dictionaries)"""
+        return dict(enumerate(self))
+
+
+class StringMapping(Mapping):
+    """Read-only dictionary string -> int. Hash index is built on first lookup"""
+
+    def __init__(self, keys: StringTable, values: np.ndarray):
+        self.keys_table = keys
+        self._values = values
+        self._index = None
+
+    def _dict(self) -> Dict[str, int]:
+        if self._index is None:
+            self._index = dict(zip(self.keys_table, self._values.tolist()))
+        return self._index
+
+    def __getitem__(self, key: str) -> int:
+        return self._dict()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys_table)
+
+    def __len__(self) -> int:
+        return len(self.keys_table)
+
+
+class FeatureStore:
+    """Reader of the feature store folder"""
+
+    def __init__(self, folder: str, mmap: bool = True):
+        self.folder = folder
+        self.mmap = mmap
+        self.meta = _load_meta(folder)
+        if len(self.meta['items']) == 0:
+            raise ValueError(f'Feature store is empty or does not exist: {folder}')
+        self._cache = {}
+
+    def _kind(self, name: str, kind: str) -> None:
+        item = self.meta['items'].get(name)
+        if item is None:
+            raise KeyError(f'Item "{name}" does not exist in feature store {self.folder}')
+        if item['kind'] != kind:
+            raise ValueError(f'Item "{name}" is {item["kind"]}, not {kind}')
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.meta['items']
+
+    def array(self, name: str) -> np.ndarray:
+        self._kind(name, 'array')
+        if name not in self._cache:
+            self._cache[name] = _load_npy(self.folder, f'{name}.npy', self.mmap)
+        return self._cache[name]
+
+    def sparse(self, name: str) -> sparse.csr_matrix:
+        """csr matrix over memory-mapped components (scipy does not copy read-only arrays)"""
+        self._kind(name, 'sparse')
+        if name not in self._cache:
+            self._cache[name] = sparse.csr_matrix(
+                (_load_npy(self.folder, f'{name}.data.npy', self.mmap),
+                 _load_npy(self.folder, f'{name}.indices.npy', self.mmap),
+                 _load_npy(self.folder, f'{name}.indptr.npy', self.mmap)),
+                shape=tuple(self.meta['items'][name]['shape']), copy=False)
+        return self._cache[name]
+
+    def _string_table(self, name: str) -> StringTable:
+        return StringTable(_load_npy(self.folder, f'{name}.utf8.npy', self.mmap),
+                           _load_npy(self.folder, f'{name}.offsets.npy', self.mmap))
+
+    def strings(self, name: str) -> StringTable:
+        self._kind(name, 'strings')
+        if name not in self._cache:
+            self._cache[name] = self._string_table(name)
+        return self._cache[name]
+
+    def mapping(self, name: str) -> StringMapping:
+        self._kind(name, 'mapping')
+        if name not in self._cache:
+            self._cache[name] = StringMapping(self._string_table(name),
+                                              _load_npy(self.folder, f'{name}.values.npy', self.mmap))
+        return self._cache[name]
+
+    # FeaturesProcessor items
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self.array('matrix')
+
+    @property
+    def skill_names(self) -> StringTable:
+        return self.strings('skill_names')
+
+    @property
+    def prof_names(self) -> StringTable:
+        return self.strings('prof_names')
+
+    @property
+    def skill_original_to_index(self) -> StringMapping:
+        return self.mapping('skill_original_to_index')
+
+    @property
+    def skill_index_to_corrected(self) -> Dict[int, str]:
+        return self.skill_names.to_dict()
+
+    @property
+    def prof_index_to_prof_name(self) -> Dict[int, str]:
+        return self.prof_names.to_dict()
+
+
+def migrate_pickles(folder: str = 'data/features') -> List[str]:
+    """
+        Convert pickled artifacts of previous versions of FeaturesProcessor to the feature store
+        Returns list of converted items
+    """
+
+    def load(filename):
+        with open(os.path.join(folder, filename), 'rb') as f:
+            return pickle.load(f)
+
+    def exists(filename):
+        return os.path.isfile(os.path.join(folder, filename))
+
+    converted = []
+    if exists('matrix.pkl'):
+        save_array(folder, 'matrix', np.asarray(load('matrix.pkl')))
+        converted.append('matrix')
+    if exists('matrix_vac.pkl'):
+        save_sparse(folder, 'matrix_vac', load('matrix_vac.pkl'))
+        converted.append('matrix_vac')
+    if exists('skill_original_to_index.pkl'):
+        save_mapping(folder, 'skill_original_to_index', load('skill_original_to_index.pkl'))
+        converted.append('skill_original_to_index')
+    for pkl, name in [('skill_index_to_corrected.pkl', 'skill_names'), ('prof_index_to_prof_name.pkl', 'prof_names')]:
+        if exists(pkl):
+            index_to_name = load(pkl)
+            save_strings(folder, name, [index_to_name[i] for i in range(len(index_to_name))])
+            converted.append(name)
+
+    return converted
+
+
+def open_store(folder: str = 'data/features', mmap: bool = True) -> FeatureStore:
+    """Open feature store folder (memory-mapped by default)"""
+    return FeatureStore(folder, mmap)
@@ -4,84 +4,167 @@ Feature processing:
         data_folder='data/processed'
         features_folder='data/features'
         config_folder='cnf'
+        approximate_quantiles=False: salary quantiles via mergeable sketches (src.utils.quantile_sketch)
+                                        instead of exact ones, for huge corpora
 
     Config (config_folder):
         - 'professions.json': professions json
+        - 'skill_aliases.json': groups of skill aliases, the first name in group is canonical
+        - 'profession_rules.json': rule base for professions by vacancy name (see profession_rules.py)
 
     Input (data_folder):
-        - 'vacancies.csv': Dataframe
+        - 'vacancies.csv': Dataframe, only VACANCY_COLUMNS are loaded on first use of self.df
+
+    Config files are parsed once per process and cached as compiled lookup structures
 
     Output (features_folder):
+        - 'skill_aliases.pkl': cached lowercase alias to canonical skill name dictionary
         - 'skills.txt': all skills after corrections ordered by name
-        - 'skill_index_to_corrected.pkl': dictionary skill index to corrected skill name
-        - 'skill_original_to_index.pkl': dictionary skill name to index
-        - 'prof_index_to_prof_name.pkl': dictinary prof index to prof name
+        - feature store (see feature_store.py), memory-mappable items:
+            - 'skill_names': skill index to corrected skill name
+            - 'skill_original_to_index': skill name to index
+            - 'prof_names': prof index to prof name
+            - 'matrix': skill-profession relationship matrix (numpy.array[skill_id, prof_id])
+            - 'skill_pmi', 'skill_cooccurrence': skill co-occurrence graph (see skill_graph.py),
+                                                    not updated by incremental processing
+        - 'features_state.pkl': aggregates for incremental processing
+        - 'weekly/<week>.pkl': aggregates of vacancies published in the week (see snapshots.py)
         - 'skills.csv': dataframe with columns:
                 ['skill_name', 'skill_id', 'salary_q25', 'salary_q50', 'salary_q75', 'frequency', 
                     'popular_profession_id', 'popular_profession_name', <professions>]
         - 'prof.csv': dataframe with columns:
                 ['prof_name', 'prof_id', 'salary_q25', 'salary_q50', 'salary_q75', 'frequency', 'popular_skills']
-        - 'matrix.pkl': skill-profession relationship matrix (numpy.array[skill_id, prof_id])
 
 
 Exsample of using:
     FeaturesProcessor().process()
 
+    # independent skills and professions branches run on a process pool, sequential run:
+    FeaturesProcessor().process(max_workers=1)
+
+    # only new vacancies are folded into aggregates of previous runs (see incremental.py)
+    FeaturesProcessor().process_incremental()
+
+    # features of the last month, assembled from weekly partitions
+    FeaturesProcessor().window_processing('2023-05-01', '2023-05-31')
+
 
 """
 
 import os
 import numpy as np
 import pandas as pd
-from src.utils import config
+from src.utils import config, list_encoding, parallel
 from src.utils.logger import configurate_logger
+from src.utils.quantile_sketch import QuantileSketch
+from src.features import feature_store, incremental, skill_graph, skill_names, snapshots
+from src.features.profession_rules import ProfessionRuleEngine, load_rules
 from typing import Tuple, Dict, List
 import re
+from collections import Counter
+from itertools import chain
+from scipy import sparse
 from tqdm import tqdm
-import pickle
 import nltk
 from nltk.corpus import stopwords
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
 
 import warnings
 warnings.filterwarnings("ignore")
 
 log = configurate_logger('FeaturesProcessor')
 
+# columns of 'vacancies.csv' used by feature processing, other (text) columns are not loaded
+VACANCY_COLUMNS = ['vacancy_id', 'name', 'skills', 'query', 
+                   'salary', 'salary_from', 'salary_to', 'publish_date']
+
+# compound skills like 'ETL\\ELT' are splitted to separate skills
+COMPOUND_SKILL_SEPARATOR = re.compile('\\\\|////')
+
+# compiled config structures of this process: (filename, mtime, size, kind) -> structure,
+#  kind of structures with per-folder artifacts contains the folder
+_config_cache : Dict[tuple, object] = {}
+
+
+def _cached_config(filename: str, kind: str, build: callable) -> object:
+    """Build structure from config file once per process, rebuild if the file has changed"""
+
+    if not os.path.isfile(filename):
+        raise ValueError(f'File does not exists: {filename}')
+
+    stat = os.stat(filename)
+    key = (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size, kind)
+    if key not in _config_cache:
+        _config_cache[key] = build(filename)
+
+    return _config_cache[key]
+
+
+def _build_skill_alias_map(filename: str, features_folder: str) -> Dict[str, str]:
+    """Alias map of 'skill_aliases.pkl' of features folder if it is actual, otherwise built and saved there"""
+
+    alias_map = skill_names.load_alias_map(filename, features_folder)
+    skill_names.save_alias_map(filename, alias_map, features_folder)
+    return alias_map
+
+
+def _build_professions(filename: str) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Professions table and query name -> profession dictionary"""
+
+    professions = pd.DataFrame(config.load(filename), columns=['query_name', 'profession'])
+    return professions, dict(zip(professions.query_name, professions.profession))
+
+
 class FeaturesProcessor:
 
     def __init__(self, 
                 data_folder='data/processed',
                 features_folder='data/features',
                 config_folder='cnf',
-                min_vacancies_for_skill = 10):
+                min_vacancies_for_skill = 10,
+                approximate_quantiles = False):
 
         tqdm.pandas()
 
-        # vacancies data frame
-        filename = os.path.join(data_folder, 'vacancies.csv')
-        if not os.path.isfile(filename):
-            raise ValueError(f'File does not exists: {filename}')
-        self.df = pd.read_csv(filename, encoding='utf-8')
+        # vacancies data frame, loaded on first use (see df property)
+        self.vacancies_filename = os.path.join(data_folder, 'vacancies.csv')
+        if not os.path.isfile(self.vacancies_filename):
+            raise ValueError(f'File does not exists: {self.vacancies_filename}')
+        self._df : pd.DataFrame = None
 
         # professions
-        filename = os.path.join(config_folder, 'professions.json')
-        if not os.path.isfile(filename):
-            raise ValueError(f'File does not exists: {filename}')
-        professions_map : List[Dict[str, str]] = config.load(filename)
-        self.professions = pd.DataFrame(columns=['query_name', 'profession'])
-        for row in professions_map:
-            self.professions = self.professions.append(row, ignore_index=True)
-
-        # skill aliases
-        filename = os.path.join(config_folder, 'skill_aliases.json')
-        if not os.path.isfile(filename):
-            raise ValueError(f'File does not exists: {filename}')
-        self.skill_aliases : List[List[str]] = config.load(filename)
+        self.professions, self.prof_map = _cached_config(
+            os.path.join(config_folder, 'professions.json'), 'professions', _build_professions)
+
+        # profession rules
+        self.profession_rules = ProfessionRuleEngine(_cached_config(
+            os.path.join(config_folder, 'profession_rules.json'), 'profession_rules', load_rules))
 
         self.features_folder = features_folder
+        self.config_folder = config_folder
         self.min_vacancies_for_skill = min_vacancies_for_skill
+        self.approximate_quantiles = approximate_quantiles
+
+        # skill aliases: 'skill_aliases.pkl' of the features folder is read (or saved) once per process
+        self.skill_alias_map : Dict[str, str] = _cached_config(
+            os.path.join(config_folder, 'skill_aliases.json'), f'skill_aliases:{os.path.abspath(features_folder)}',
+            lambda filename: _build_skill_alias_map(filename, features_folder))
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """Vacancies data frame, only VACANCY_COLUMNS are loaded"""
+
+        if self._df is None:
+            log.info('Loading vacancies...')
+            self._df = pd.read_csv(self.vacancies_filename, encoding='utf-8', 
+                                   usecols=lambda c: c in VACANCY_COLUMNS)
+            log.info('Loaded vacancies: %s', self._df.shape[0])
+
+        return self._df
 
+    @df.setter
+    def df(self, value: pd.DataFrame) -> None:
+        self._df = value
 
     def _extract_skills(self) -> Dict[str, float]:
         """
@@ -92,18 +175,98 @@ class FeaturesProcessor:
                 Skills dictionary. Key is skill. Value is normalized frequency
         """
         log.info('Extracting skills...')
-        r = re.compile('\\\\|////|,')
-        self.df['skill_set'] = self.df['skills'].apply(
-            lambda s : {x.strip(" '") for x in re.split(r, s.strip('[]'))} - {''})
+        self.df['skill_set'] = [
+            {x.strip() for skill in skills for x in COMPOUND_SKILL_SEPARATOR.split(skill)} - {''}
+            for skills in list_encoding.decode_column(self.df['skills'])]
         all_skills = set().union(*self.df.skill_set.to_list())
+        self.skill_counts = Counter(chain.from_iterable(self.df.skill_set))
 
         skills = {}
         rows_count = self.df.shape[0]
-        for skill in tqdm(all_skills):
-            skills[skill] = self.df.skill_set.apply(lambda x: skill in x).sum() / rows_count
+        for skill in all_skills:
+            skills[skill] = self.skill_counts[skill] / rows_count
 
         return skills
 
+    def _create_vacancy_skill_matrix(self) -> sparse.csr_matrix:
+        """
+            Create sparse vacancy-skill incidence matrix (csr_matrix[vacancy_no, skill_id]).
+            Value is count of original skill names of the vacancy mapped to the skill_id,
+            so several aliases in one vacancy are counted as in the relationship matrix
+        """
+
+        log.info('Creating vacancy-skill matrix...')
+
+        rows = np.repeat(np.arange(self.df.shape[0]), self.df['skill_set'].apply(len).to_numpy())
+        cols = np.fromiter((self.skill_original_to_index[s] for ss in self.df['skill_set'] for s in ss),
+                            dtype=np.int64, count=rows.shape[0])
+
+        return sparse.csr_matrix((np.ones(rows.shape[0]), (rows, cols)),
+                                 shape=(self.df.shape[0], len(self.skill_index_to_corrected)))
+
+    def _create_vacancy_prof_matrix(self) -> sparse.csr_matrix:
+        """Create sparse vacancy-profession incidence matrix (csr_matrix[vacancy_no, prof_id])"""
+
+        log.info('Creating vacancy-profession matrix...')
+
+        prof_to_index = {v: k for k, v in self.prof_index_to_prof_name.items()}
+
+        rows = np.repeat(np.arange(self.df.shape[0]), self.df['prof_set'].apply(len).to_numpy())
+        cols = np.fromiter((prof_to_index[p] for ps in self.df['prof_set'] for p in ps),
+                            dtype=np.int64, count=rows.shape[0])
+
+        return sparse.csr_matrix((np.ones(rows.shape[0]), (rows, cols)),
+                                 shape=(self.df.shape[0], len(self.prof_index_to_prof_name)))
+
+    def _salary_long_df(self, vacancy_entity: sparse.csr_matrix, rows: np.ndarray = None) -> pd.DataFrame:
+        """
+            Long-form table of salaries (entity_id, salary_mid):
+            one row per pair of entity (column of incidence matrix) and vacancy with salary
+            rows: vacancies (rows of self.df) of the incidence matrix, all by default
+        """
+
+        df = self.df if rows is None else self.df.iloc[rows]
+        has_salary = df['salary'].to_numpy(dtype=bool)
+        salary_mid = ((df['salary_from'] + df['salary_to']) / 2).to_numpy(dtype=float)
+
+        pairs = vacancy_entity.tocoo()
+        mask = has_salary[pairs.row]
+        return pd.DataFrame({'entity_id': pairs.col[mask], 'salary_mid': salary_mid[pairs.row[mask]]})
+
+    def _salary_sketches(self, vacancy_entity: sparse.csr_matrix, 
+                         rows: np.ndarray = None) -> Dict[int, QuantileSketch]:
+        """Mergeable salary quantile sketches of each entity (column) of an incidence matrix"""
+
+        salaries = self._salary_long_df(vacancy_entity, rows).sort_values('entity_id', kind='stable')
+        entity_ids, starts = np.unique(salaries['entity_id'].to_numpy(), return_index=True)
+        values = np.split(salaries['salary_mid'].to_numpy(), starts[1:])
+
+        return {int(k): QuantileSketch().update(v) for k, v in zip(entity_ids, values)}
+
+    def _salary_quantiles(self, vacancy_entity: sparse.csr_matrix, 
+                          min_vacancies: int = 0) -> Dict[int, Tuple[float, float, float]]:
+        """
+            Salary quantiles (0.25, 0.50, 0.75) of the vacancies of each entity (column)
+            of an incidence matrix. Entities with salary count not more than min_vacancies are skipped
+            All entities are calculated in one groupby pass (or via sketches if approximate_quantiles)
+
+            return: Dict[int, Tuple[float, float, float]]:
+                Key is the column index. Value is tuple of quantiles
+        """
+
+        if self.approximate_quantiles:
+            sketches = self._salary_sketches(vacancy_entity)
+            counts = vacancy_entity.tocsc()[self.df['salary'].to_numpy(dtype=bool)].getnnz(axis=0)
+            return {k: tuple(v.quantile([0.25, 0.50, 0.75])) 
+                    for k, v in sketches.items() if counts[k] > min_vacancies}
+
+        grouped = self._salary_long_df(vacancy_entity).groupby('entity_id')['salary_mid']
+        counts = grouped.size()
+        stats = grouped.quantile([0.25, 0.50, 0.75]).unstack()
+        stats = stats[counts[stats.index] > min_vacancies]
+
+        return dict(zip(stats.index, map(tuple, stats.to_numpy())))
+
     def _skills_corrections(self, skills: Dict[str, float]) -> Tuple[Dict[int, str], Dict[str, int]]:
         """Skills correction:
             - discarding case, spec-sumbols
@@ -126,19 +289,18 @@ class FeaturesProcessor:
 
         log.info('Correcting skills...')
 
-        def simplify(s):
-            for x in self.skill_aliases:
-                if s.lower() in [y.lower() for y in x]:
-                    s = x[0]
-                    break
+        alias_map = self.skill_alias_map
 
-            return s.lower().replace(' ', '').replace('-', '').replace('/','').replace(':','')
+        def simplify(s):
+            return skill_names.simplify(s, alias_map)
 
         new_index  = 0
         index_to_corrected = {}
         original_to_index = {}
         simplified_to_index = {}
-        for skill in skills.keys():
+        # the most frequent member of each group, the first one wins on ties
+        index_to_best_frequency = {}
+        for skill, frequency in skills.items():
             simplified_skill = simplify(skill)
             index = simplified_to_index.get(simplified_skill, new_index)
             original_to_index[skill] = index
@@ -146,18 +308,16 @@ class FeaturesProcessor:
             if index == new_index:
                 simplified_to_index[simplified_skill] = index
                 index_to_corrected[index] = skill
+                index_to_best_frequency[index] = frequency
                 new_index += 1
-            else:
-                skill_aliases = [k for k, v in original_to_index.items() if v == index]
-                if skill not in skill_aliases:
-                    skill_aliases += [skill]
-                best_name = skill_aliases[np.array([skills[x] for x in skill_aliases]).argmax()]
-                index_to_corrected[index] = best_name
+            elif frequency > index_to_best_frequency[index]:
+                index_to_corrected[index] = skill
+                index_to_best_frequency[index] = frequency
 
         return original_to_index, index_to_corrected
 
-    def _create_skill_df(self, original_to_index: Dict[str, int],
-                        index_to_corrected: Dict[int, str]) -> pd.DataFrame:
+    def _create_skill_df(self, index_to_corrected: Dict[int, str], frequency: np.ndarray,
+                         quantiles: Dict[int, Tuple[float, float, float]]) -> pd.DataFrame:
         """
             Create skills dataframe and calculate skills features.
             Dataframe columns:
@@ -175,28 +335,14 @@ class FeaturesProcessor:
         skill_df['skill_name'] = index_to_corrected.values()
         skill_df['skill_id'] = index_to_corrected.keys()
 
-        salary_q25 = {}
-        salary_q50 = {}
-        salary_q75 = {}
-        skill_freq = {}
-
-        df = self.df[['skill_set', 'salary', 'salary_from', 'salary_to']].copy()
-        df['skill_ind_set'] = df['skill_set'].apply(lambda x: set([original_to_index[s] for s in x]))
-
-        for s in skill_df.skill_id:
-            s_df = df[df['skill_ind_set'].apply(lambda x: s in x)]
-            skill_freq[s] = s_df.shape[0] / df.shape[0]
-            s_df = s_df[s_df['salary']]
-            if s_df.shape[0] > self.min_vacancies_for_skill:
-                salaries = (s_df['salary_from'] + s_df['salary_to']) / 2
-                salary_q25[s] = int(salaries.quantile(0.25))
-                salary_q50[s] = int(salaries.quantile(0.50))
-                salary_q75[s] = int(salaries.quantile(0.75))
+        salary_q25 = {k: int(v[0]) for k, v in quantiles.items()}
+        salary_q50 = {k: int(v[1]) for k, v in quantiles.items()}
+        salary_q75 = {k: int(v[2]) for k, v in quantiles.items()}
 
         skill_df['salary_q25'] = skill_df['skill_id'].apply(lambda x: salary_q25.get(x, None))
         skill_df['salary_q50'] = skill_df['skill_id'].apply(lambda x: salary_q50.get(x, None))
         skill_df['salary_q75'] = skill_df['skill_id'].apply(lambda x: salary_q75.get(x, None))
-        skill_df['frequency'] = skill_df['skill_id'].apply(lambda x: skill_freq.get(x, None))
+        skill_df['frequency'] = frequency[skill_df['skill_id'].to_numpy()]
 
         log.info('Created skills data frame')
 
@@ -218,47 +364,56 @@ class FeaturesProcessor:
 
         log.info('Updating skill dataframe...')
 
+        prof_names = np.array([self.prof_index_to_prof_name[i] for i in range(len(self.prof_index_to_prof_name))])
         prof_frequency = self.prof_df.sort_values(by='prof_id').frequency.to_numpy()
-        self.skill_df['popular_profession_id'] = (self.matrix / prof_frequency).argmax(axis=1)
-        self.skill_df['popular_profession_name'] = \
-            self.skill_df.popular_profession_id.apply(lambda x: self.prof_index_to_prof_name[x])
-
-        matrix_colsum = self.matrix.sum(axis=0)
-        for k, v in self.prof_index_to_prof_name.items():
-            self.skill_df[v] = self.skill_df['skill_id'].apply(lambda x: self.matrix[x, k] / matrix_colsum[k])
+        # professions without vacancies (e.g. in a window) have zero weight, not NaN
+        weighted = np.divide(self.matrix, prof_frequency, out=np.zeros(self.matrix.shape), where=prof_frequency > 0)
+        self.skill_df['popular_profession_id'] = weighted.argmax(axis=1)
+        self.skill_df['popular_profession_name'] = prof_names[self.skill_df.popular_profession_id.to_numpy()]
+
+        # share of skill in each profession (column-normalized matrix)
+        skill_ids = self.skill_df['skill_id'].to_numpy()
+        prof_counts = self.matrix.sum(axis=0)
+        self.skill_df[list(prof_names)] = np.divide(self.matrix[skill_ids], prof_counts,
+                                                    out=np.zeros((skill_ids.shape[0], self.matrix.shape[1])),
+                                                    where=prof_counts > 0)
 
         log.info('Updated skill dataframe...')
 
 
-    def skills_processing(self) -> None:
+    def skills_processing(self, save: bool = True) -> None:
         """
         Make skill processing
-        Save files:
+        Save files (if save):
             - 'skills.txt': all skills after corrections ordered by name
-            - 'skill_original_to_index.pkl': dictionary skill name to index
-            - 'skill_index_to_corrected.pkl': dictionary skill index to corrected skill name
+            - feature store 'skill_original_to_index': dictionary skill name to index
+            - feature store 'skill_names': skill index to corrected skill name
         """
 
         skills = self._extract_skills()
         self.skill_original_to_index, self.skill_index_to_corrected = self._skills_corrections(skills)
+        if save:
+            self._save_skill_index()
+
+        self.vacancy_skill = self._create_vacancy_skill_matrix()
+        self.skill_df = self._create_skill_df(self.skill_index_to_corrected,
+            self.vacancy_skill.getnnz(axis=0) / self.vacancy_skill.shape[0],
+            self._salary_quantiles(self.vacancy_skill, self.min_vacancies_for_skill))
+
+    def _save_skill_index(self) -> None:
+        """Save 'skills.txt' and skill indices to feature store"""
 
         filename = os.path.join(self.features_folder, 'skills.txt')
         with open(filename, 'w', encoding='utf-8') as f:
             f.writelines([x + '\n' for x in sorted(self.skill_index_to_corrected.values())])
 
-        filename = os.path.join(self.features_folder, 'skill_original_to_index.pkl')
-        with open(filename, 'wb') as f:
-            pickle.dump(self.skill_original_to_index, f)
-
-        filename = os.path.join(self.features_folder, 'skill_index_to_corrected.pkl')
-        with open(filename, 'wb') as f:
-            pickle.dump(self.skill_index_to_corrected, f)
+        feature_store.save_mapping(self.features_folder, 'skill_original_to_index', self.skill_original_to_index)
+        feature_store.save_strings(self.features_folder, 'skill_names', 
+            [self.skill_index_to_corrected[i] for i in range(len(self.skill_index_to_corrected))])
 
         log.info('All skills count = %s, after correction = %s',
                 len(self.skill_original_to_index), len(self.skill_index_to_corrected))
 
-        self.skill_df = self._create_skill_df(self.skill_original_to_index, self.skill_index_to_corrected)
-
 
     def save_prof_df(self) -> None:
         """Save skill dataframe to file
@@ -273,279 +428,439 @@ class FeaturesProcessor:
     def update_prof_df(self, top_n: int = 10) -> None:
         """
         Update prof_df
-        Add weighed most popular profession to each skill"""
+        Add top_n most popular skills to each profession"""
 
         log.info('Updating prof data frame...')
-        self.prof_df['popular_skills'] = self.prof_df['prof_id'].apply(
-            lambda i: ', '.join([self.skill_index_to_corrected[x] for x in self.matrix[:,i].argsort()[::-1]][:10]))
-        log.info('Updated prof data frame...')
-
-    def update_profset_column(self, xdf: pd.DataFrame) -> pd.DataFrame:
-        """Update (improove) 'prof_set' column"""
-
-        def _simplify(s):
-                return s.lower(). \
-                    replace('"', ' '). \
-                    replace(",", ' '). \
-                    replace('(', ' '). \
-                    replace(')', ' '). \
-                    replace('\\', ' '). \
-                    replace('-', ' '). \
-                    replace('/', ' '). \
-                    replace('.', ' ')
-
-        #xdf['lemm_name'] = _lemmatize(xdf)
-
-        def apply_rule_and(df: pd.DataFrame, prof: str, keywords_list: List[str] = None, only_empty: bool = False) -> pd.DataFrame:
-            if keywords_list is None:
-                keywords_list = [prof]
-
-            for keywords in keywords_list:
-                keywords = re.split(' |-', keywords)
-
-                rule = df.apply(lambda x: 
-                                all([(kw.lower() in x['name'].lower()) for kw in keywords]) and
-                                (only_empty == False or len(x['prof_set_rulebase']) == 0)
-                                , axis=1)
-                filter = df[rule].index
-
-                df.loc[filter, 'prof_set_rulebase'] = \
-                    df.loc[filter, 'prof_set_rulebase'].apply(lambda x: x.union(set([prof])))
-
-            return df
-
-        def apply_rule_kw(df: pd.DataFrame, prof: str, keywords: List[str], only_empty: bool = False) -> pd.DataFrame:
-            for kw in keywords:
-                kw = f' {kw.lower()} '
-                rule = df.apply(lambda x:
-                                kw in ' '+_simplify(x['name'])+' ' and
-                                (only_empty == False or len(x['prof_set_rulebase']) == 0)
-                                , axis=1)
-                filter = df[rule].index
 
-                df.loc[filter, 'prof_set_rulebase'] = \
-                        df.loc[filter, 'prof_set_rulebase'].apply(lambda x: x.union(set([prof])))
+        top_n = min(top_n, self.matrix.shape[0])
+        # stable sort keeps ties in skill index order
+        top = np.argsort(-self.matrix, axis=0, kind='stable')[:top_n]
 
-            return df
-
-        xdf['prof_set_rulebase'] = [set([]) for _ in range(len(xdf))]
+        skill_names = np.array([self.skill_index_to_corrected[i] for i in range(len(self.skill_index_to_corrected))])
+        self.prof_df['popular_skills'] = self.prof_df['prof_id'].apply(lambda i: ', '.join(skill_names[top[:, i]]))
+        log.info('Updated prof data frame...')
 
-        # Аналитики
-        xdf = apply_rule_and(xdf, 'Системный аналитик')
-        xdf = apply_rule_and(xdf, 'Бизнес-аналитик', ['Бизнес-аналитик', 'Business Analyst'])
-        xdf = apply_rule_kw(xdf, 'Аналитик BI', ['Аналитик BI', 'BI analyst'], only_empty=True)
-        xdf = apply_rule_and(xdf, 'Аналитик данных', ['Аналитик данных', 'Data Analyst'])
-        xdf = apply_rule_and(xdf, 'Продуктовый аналитик')
-        xdf = apply_rule_and(xdf, 'Аналитик', ['Аналитик', 'Analyst'], only_empty=True)
+    def update_profset_column(self, xdf: pd.DataFrame) -> pd.DataFrame:
+        """Update (improove) 'prof_set' column by the rule base (see profession_rules.py)"""
 
-        # Администратор баз данных
-        xdf = apply_rule_and(xdf, 'Администратор баз данных', ['Администратор баз данных', 'Администратор БД'])
+        xdf['prof_set'] = self.profession_rules.apply(xdf['name'], xdf['prof_set'])
 
-        # Инженеры данных
-        xdf = apply_rule_and(xdf, 'Инженер данных', ['Инженер данных', 'Data Engineer', 
-                        'Дата инженер', 'Data инженер',
-                        'Data Architect', 'Hadoop', 'Kafka'
-        ])
-        xdf = apply_rule_kw(xdf, 'Инженер данных', ['баз данных', 'PostgreSQL', 'MSSQL'], only_empty=True)
-        xdf = apply_rule_kw(xdf, 'Инженер данных', ['Hadoop', 'Kafka'])
+        log.info('Profession rules applied:\n%s', self.profession_rules.report_str())
 
+        return xdf
 
-        # Дата Сайенс
-        xdf = apply_rule_and(xdf, 'Data Scientist')
 
-        # ML инженер
-        xdf = apply_rule_kw(xdf, 'ML инженер', ['ML', 'ETL', 'MLOps'])
+    def professions_processing(self, save: bool = True) -> None:
+        """Professions preprocess:
+            Add column 'prof_set' to self.df
 
-        # Big Data
-        xdf = apply_rule_kw(xdf, 'Big Data', ['Big Data', 'Биг Дата', 'DWH', 'Data lake', 'Hadoop', 'Kafka',
-                                            'больших данных', 'большие данные'])
+        Save files (if save):
+            - feature store 'prof_names': profession index to profession name
+            - 'vacancy_profset.csv': data frame [vacancy_id, prof_set]
+        """
 
-        # остатки
-        xdf = apply_rule_and(xdf, 'Data Scientist', ['Data Science'])
-        xdf = apply_rule_and(xdf, 'Computer Vision', ['Computer Vision', 'CV'])
-        xdf = apply_rule_and(xdf, 'NLP', ['Computer Vision', 'NLP', 'Natural Language Processing'])
+        log.info('Processing professions...')
 
-        processed = xdf[xdf.prof_set_rulebase.apply(lambda x: x != set([]))].shape[0]
+        self._extract_professions()
 
-        rule = xdf.prof_set_rulebase.apply(lambda x: x == set([]))
-        filter = xdf[rule].index
-        xdf.loc[filter, 'prof_set_rulebase'] = xdf.loc[filter, 'prof_set']
+        # calculate prof_index_to_prof_name
+        self.prof_index_to_prof_name = {}
+        all_prof = set().union(*self.df.prof_set.to_list())
+        for i, n in enumerate(all_prof):
+            self.prof_index_to_prof_name[i] = n
 
-        #xdf.to_csv('data/prof_ds.csv', index=False, encoding='utf-8')
-        xdf['prof_set'] = xdf['prof_set_rulebase']
-        xdf = xdf.drop(columns=['prof_set_rulebase'])
+        if save:
+            self._save_professions()
 
-        # Total: 3339, processed: 3133
-        #print(f'Total: {xdf.shape[0]}, processed: {processed}')
+        self.vacancy_prof = self._create_vacancy_prof_matrix()
+        self.prof_df = self._create_prof_df(self.vacancy_prof.getnnz(axis=0) / self.vacancy_prof.shape[0],
+                                            self._salary_quantiles(self.vacancy_prof))
 
-        return xdf
+        log.info('Processed professions')
 
+    def _save_professions(self) -> None:
+        """Save profession index and 'vacancy_profset.csv'"""
 
-    def professions_processing(self) -> None:
-        """Professions preprocess:
-            Add column 'prof_set' to self.df
+        self._save_prof_index()
 
-        Save files:
-            - 'prof_index_to_prof_name': dict profession index to profession name
-            - 'vacancy_profset.csv': data frame [vacancy_id, prof_set]
-        """
+        filename = os.path.join(self.features_folder, 'vacancy_profset.csv')
+        self.df[['vacancy_id', 'prof_set']].to_csv(filename, index=False, encoding='utf-8')
 
-        log.info('Processing professions...')
+    def _extract_professions(self) -> None:
+        """Add column 'prof_set' to self.df: professions of search queries improoved by rule base"""
 
         # map query to profession
-        prof_map = dict(zip(self.professions.query_name, self.professions.profession))
+        prof_map = self.prof_map
 
-
-        # calculate 'prof_set' column
-        r = re.compile('\\\\|////|,')
-        def query_to_prof_set(s):
-            query_set = {x.strip(" '") for x in re.split(r, s.strip('[]'))} - {''}
-            prof_set = set([])
-            for q in query_set:
-                prof_set.add(prof_map.get(q.strip('"'), q))
-            return prof_set
-
-        self.df['prof_set'] = self.df['query'].apply(query_to_prof_set)
+        # calculate 'prof_set' column, hh queries are quoted ('"data scientist"'), config names are not
+        self.df['prof_set'] = [{prof_map.get(q.strip('"'), q) for q in {x.strip(" '") for x in queries} - {''}}
+                               for queries in list_encoding.decode_column(self.df['query'])]
 
         # improove prof_set
         self.df = self.update_profset_column(self.df)
 
-        # calculate prof_index_to_prof_name
-        self.prof_index_to_prof_name = {}
-        all_prof = set().union(*self.df.prof_set.to_list())
-        for i, n in enumerate(all_prof):
-            self.prof_index_to_prof_name[i] = n
+    def _save_prof_index(self) -> None:
+        """Save prof_index_to_prof_name to feature store"""
+        feature_store.save_strings(self.features_folder, 'prof_names',
+            [self.prof_index_to_prof_name[i] for i in range(len(self.prof_index_to_prof_name))])
 
-        # save prof_index_to_prof_name
-        filename = os.path.join(self.features_folder, 'prof_index_to_prof_name.pkl')
-        with open(filename, 'wb') as f:
-            pickle.dump(self.prof_index_to_prof_name, f)
+    def _create_prof_df(self, frequency: np.ndarray, 
+                        quantiles: Dict[int, Tuple[float, float, float]]) -> pd.DataFrame:
+        """
+            Create professions dataframe.
+            Dataframe columns: ['prof_name', 'prof_id', 'salary_q25', 'salary_q50', 'salary_q75', 'frequency']
+        """
 
-        # save prof_set
-        filename = os.path.join(self.features_folder, 'vacancy_profset.csv')
-        self.df[['vacancy_id', 'prof_set']].to_csv(filename, index=False, encoding='utf-8')
+        prof_df = pd.DataFrame()
+        prof_df['prof_name'] = self.prof_index_to_prof_name.values()
+        prof_df['prof_id'] = self.prof_index_to_prof_name.keys()
 
-        # create prof_df data frame
-        self.prof_df = pd.DataFrame()
-        self.prof_df['prof_name'] = self.prof_index_to_prof_name.values()
-        self.prof_df['prof_id'] = self.prof_index_to_prof_name.keys()
-        
-        salary_q25 = {}
-        salary_q50 = {}
-        salary_q75 = {}
-        prof_freq = {}
-
-        for p in self.prof_df.prof_name:
-            p_df = self.df[self.df['prof_set'].apply(lambda x: p in x)]            
-            prof_freq[p] = p_df.shape[0] / self.df.shape[0]
-            p_df = p_df[p_df.salary]
-            if p_df.shape[0] > 0:
-                salaries = (p_df['salary_from'] + p_df['salary_to']) / 2
-                salary_q25[p] = round(salaries.quantile(0.25))
-                salary_q50[p] = round(salaries.quantile(0.50))
-                salary_q75[p] = round(salaries.quantile(0.75))
-
-        self.prof_df['salary_q25'] = self.prof_df.prof_name.apply(lambda x: salary_q25.get(x, None))
-        self.prof_df['salary_q50'] = self.prof_df.prof_name.apply(lambda x: salary_q50.get(x, None))
-        self.prof_df['salary_q75'] = self.prof_df.prof_name.apply(lambda x: salary_q75.get(x, None))
-        self.prof_df['frequency'] = self.prof_df.prof_name.apply(lambda x: prof_freq.get(x, None))
+        salary_q25 = {k: round(v[0]) for k, v in quantiles.items()}
+        salary_q50 = {k: round(v[1]) for k, v in quantiles.items()}
+        salary_q75 = {k: round(v[2]) for k, v in quantiles.items()}
 
-        log.info('Processed professions')
+        prof_df['salary_q25'] = prof_df.prof_id.apply(lambda x: salary_q25.get(x, None))
+        prof_df['salary_q50'] = prof_df.prof_id.apply(lambda x: salary_q50.get(x, None))
+        prof_df['salary_q75'] = prof_df.prof_id.apply(lambda x: salary_q75.get(x, None))
+        prof_df['frequency'] = frequency[prof_df['prof_id'].to_numpy()]
+
+        return prof_df
 
     def rel_matrix_processing(self) -> np.array:
         """
         Return and save skill-profession relationship matrix
         Matrix dim is about 8000x10 therefore numpy is enough
+        It is computed as product of incidence matrices: vacancy_skill.T * vacancy_prof
 
-        Save matrix to 'matrix.pkl' file
+        Save matrix to feature store 'matrix'
         """
 
         log.info('Creating relationship matrix...')
 
-        prof_to_index = {}
-        for k, v in self.prof_index_to_prof_name.items():
-            prof_to_index[v] = k
-        
-        self.matrix = np.zeros((len(self.skill_index_to_corrected), len(self.prof_index_to_prof_name)))
-        for row in self.df[['prof_set', 'skill_set']].to_numpy():
-            for prof in row[0]:
-                prof_id = prof_to_index[prof]
-                for skill in row[1]:
-                    skill_id = self.skill_original_to_index[skill]
-                    self.matrix[skill_id, prof_id] += 1
-
-        filename = os.path.join(self.features_folder, 'matrix.pkl')
-        with open(filename, 'wb') as f:
-            pickle.dump(self.matrix, f)
+        self.matrix = (self.vacancy_skill.T @ self.vacancy_prof).toarray()
+
+        feature_store.save_array(self.features_folder, 'matrix', self.matrix)
 
         log.info('Created relationship matrix')
 
         return self.matrix
 
-    def rel_matrix_tfidf_processing(self, column: str) -> np.array:
+    def rel_matrix_tfidf_processing(self, column: str) -> sparse.csr_matrix:
         """
         Save relationship matrix ased tf-idf of name or description
-        bla-bla-bla
+        Skill document is all texts of the skill vacancies, its term counts are
+        vacancy_skill.T * (vacancy-term counts), so texts are not concatenated
+        and the matrix is sparse all the way (dense description matrix is about 650Mb)
+
+        Save matrix to feature store 'matrix_<column>_tfidf' (csr_matrix[skill_id, term_id])
+        and its terms to 'matrix_<column>_tfidf_terms'
         
         Embeddings quality is VERY low
         """
 
-        log.info('Creating relationship matrix (TF-IDF of name)...')
+        log.info('Creating relationship matrix (TF-IDF of %s)...', column)
 
         nltk.download('stopwords')
         stop_words = set(stopwords.words('english')).union(stopwords.words('russian'))
 
-        skill_text = []
-        for si in tqdm(self.skill_index_to_corrected.keys()):
-            # you can try unique text
-            st = ' '.join(self.df[self.df.skill_ind_set.apply(lambda x: si in x)][column])
-            skill_text.append(st)
+        # you can try binary counts (unique text)
+        vectorizer = CountVectorizer(stop_words=list(stop_words))
+        df = self.df
+        if column not in df.columns:
+            # text columns are not in VACANCY_COLUMNS, rows of df (the rows of incidence matrices)
+            # may be filtered, so texts are joined by vacancy_id, not by position
+            texts = pd.read_csv(self.vacancies_filename, encoding='utf-8', usecols=['vacancy_id', column])
+            texts = texts.drop_duplicates('vacancy_id').set_index('vacancy_id')[column]
+            df[column] = df['vacancy_id'].map(texts)
+        vacancy_terms = vectorizer.fit_transform(df[column].fillna(''))
+
+        skill_vacancy = (self.vacancy_skill > 0).T.astype(vacancy_terms.dtype).tocsr()
+        skill_terms = skill_vacancy @ vacancy_terms
 
-        # you can try CountVectorizer
-        vectorizer = TfidfVectorizer(stop_words=list(stop_words))
-        X = vectorizer.fit_transform(skill_text)
+        # terms of vacancies without skills
+        used_terms = skill_terms.getnnz(axis=0) > 0
+        skill_terms = skill_terms[:, used_terms]
 
-        filename = f'../data/features/matrix_{column}_tfidf.pkl'
-        with open(filename, 'wb') as f:
-            # numpy for compatibility (35Mb numpy vs 0.4Mb scr_matrix)
-            #  but for descriptins it's 650Mb!
-            pickle.dump(X.toarray(), f)  
+        # you can try counts without idf
+        X = TfidfTransformer().fit_transform(skill_terms).tocsr()
 
-        log.info('Created relationship matrix (TF-IDF of name)')
+        feature_store.save_sparse(self.features_folder, f'matrix_{column}_tfidf', X)
+        feature_store.save_strings(self.features_folder, f'matrix_{column}_tfidf_terms',
+                                   vectorizer.get_feature_names_out()[used_terms])
+
+        log.info('Created relationship matrix (TF-IDF of %s), shape %s, nnz %s', column, X.shape, X.nnz)
 
         return X
 
-    def rel_matrix_vacancy_processing(self) -> np.array:
+    def rel_matrix_vacancy_processing(self) -> sparse.csr_matrix:
         """
         Matrix vacany-skill (not prof-skil)
         Bad idea too :(
+        Sparse matrix skill-vacancy (scipy.sparse.csr_matrix[skill_id, vacancy_no]) with 0/1 values
 
-        Save matrix to 'matrix_val.pkl' file
+        Save matrix to feature store 'matrix_vac'
         """
 
         log.info('Creating relationship vacancy matrix...')
 
-        matrix_vac = np.zeros((len(self.skill_index_to_corrected), self.df.shape[0]))
-        for vi in self.df.index:
-            ss = self.df.loc[vi, 'skill_ind_set']
-            for si in ss:
-                matrix_vac[si, vi] += 1
+        matrix_vac = (self.vacancy_skill.T > 0).astype(float).tocsr()
 
-        filename = os.path.join(self.features_folder, 'matrix_vac.pkl')
-        with open(filename, 'wb') as f:
-            pickle.dump(matrix_vac, f)
+        feature_store.save_sparse(self.features_folder, 'matrix_vac', matrix_vac)
 
         log.info('Created relationship vacancy matrix')
 
         return matrix_vac
 
-    def process(self) -> None:
-        """Conduct all process. Input and output date in files"""
+    def skill_graph_processing(self, top_k: int = 20, min_count: int = 2) -> sparse.csr_matrix:
+        """
+        Return and save skill co-occurrence graph (see skill_graph.py):
+        positive pmi of skill pairs with at least min_count common vacancies, top_k neighbours per skill
+
+        Save matrices to feature store 'skill_pmi' and 'skill_cooccurrence'
+        """
+
+        log.info('Creating skill graph...')
+
+        cooc = skill_graph.cooccurrence(self.vacancy_skill)
+        graph = skill_graph.top_k_per_row(skill_graph.pmi(cooc, self.vacancy_skill.shape[0], min_count), top_k)
+        # counts of the kept pairs
+        graph_cooc = cooc.multiply(graph > 0).tocsr()
+
+        feature_store.save_sparse(self.features_folder, 'skill_pmi', graph)
+        feature_store.save_sparse(self.features_folder, 'skill_cooccurrence', graph_cooc)
+
+        log.info('Created skill graph: %s skills, %s edges', graph.shape[0], graph.nnz)
+
+        return graph
+
+    def _aggregate(self, rows: np.ndarray = None) -> incremental.FeaturesState:
+        """Mergeable aggregates of vacancies (rows of self.df, all by default), see incremental.py"""
+
+        df = self.df if rows is None else self.df.iloc[rows]
+        vacancy_skill = self.vacancy_skill if rows is None else self.vacancy_skill[rows]
+        vacancy_prof = self.vacancy_prof if rows is None else self.vacancy_prof[rows]
+        has_salary = df['salary'].to_numpy(dtype=bool)
+
+        return incremental.FeaturesState(
+            vacancy_ids=set(df['vacancy_id'].astype(str)),
+            skill_vacancy_counts=vacancy_skill.getnnz(axis=0),
+            skill_salary_counts=vacancy_skill[has_salary].getnnz(axis=0),
+            prof_vacancy_counts=vacancy_prof.getnnz(axis=0),
+            prof_salary_counts=vacancy_prof[has_salary].getnnz(axis=0),
+            row_count=df.shape[0],
+            matrix=(vacancy_skill.T @ vacancy_prof).toarray(),
+            skill_sketches=self._salary_sketches(vacancy_skill, rows),
+            prof_sketches=self._salary_sketches(vacancy_prof, rows))
+
+    def _create_state(self) -> incremental.FeaturesState:
+        """State for incremental processing: aggregates of all vacancies and indices"""
+
+        state = self._aggregate()
+        state.config_hash = incremental.config_hash(self.config_folder)
+        state.original_counts = {k: self.skill_counts[k] for k in self.skill_original_to_index}
+        state.prof_names = [self.prof_index_to_prof_name[i] for i in range(len(self.prof_index_to_prof_name))]
+
+        return state
+
+    def _fold_state(self, state: incremental.FeaturesState) -> None:
+        """
+            Fold new vacancies (self.df) into the state.
+            Indices of skills and professions of the state are kept, new ones are appended
+        """
+
+        total = state.row_count + self.df.shape[0]
+
+        # skills: known names first in the same order, so their indices are the same
+        self._extract_skills()
+        original_counts = {k: v + self.skill_counts.get(k, 0) for k, v in state.original_counts.items()}
+        for k in set().union(*self.df.skill_set.to_list()):
+            original_counts.setdefault(k, self.skill_counts[k])
+
+        self.skill_original_to_index, self.skill_index_to_corrected = \
+            self._skills_corrections({k: v / total for k, v in original_counts.items()})
+        self.vacancy_skill = self._create_vacancy_skill_matrix()
+
+        # professions: new names are appended
+        self._extract_professions()
+        prof_names = list(state.prof_names)
+        for p in set().union(*self.df.prof_set.to_list()) - set(prof_names):
+            prof_names.append(p)
+        self.prof_index_to_prof_name = dict(enumerate(prof_names))
+        self.vacancy_prof = self._create_vacancy_prof_matrix()
+
+        incremental.merge_aggregates(state, self._aggregate())
+        state.original_counts = original_counts
+        state.prof_names = prof_names
+
+    def weekly_partitions_processing(self, replace: bool = True) -> None:
+        """
+            Save aggregates of vacancies (self.df) partitioned by week of publish_date (see snapshots.py)
+            replace: remove all partitions before, otherwise aggregates are merged into existing partitions
+        """
+
+        log.info('Processing weekly partitions...')
+
+        if replace:
+            snapshots.remove_partitions(self.features_folder)
+
+        weeks = snapshots.week_of(self.df['publish_date'])
+        if weeks.isna().any():
+            log.warning('Vacancies without publish_date are not partitioned: %s', weeks.isna().sum())
 
-        self.skills_processing()
-        self.professions_processing()
+        for week, rows in weeks.groupby(weeks).indices.items():
+            partition = self._aggregate(rows)
+            if not replace:
+                previous = snapshots.load_partition(self.features_folder, week)
+                if previous is not None:
+                    partition = incremental.merge_aggregates(previous, partition)
+            snapshots.save_partition(self.features_folder, week, partition)
+
+        log.info('Processed weekly partitions')
+
+    def window_processing(self, start: str = None, end: str = None, output_folder: str = None) -> str:
+        """
+            Assemble features of vacancies published in window [start, end] (dates 'YYYY-MM-DD')
+            by summing weekly partitions, vacancies are not processed.
+            Skill and profession indices are taken from the feature store of features_folder
+
+            Save files to output_folder ('<features_folder>/snapshots/<start>_<end>' by default):
+                - 'skills.csv', 'prof.csv', feature store 'matrix'
+
+            Returns output folder
+        """
+
+        log.info('Assembling window %s - %s...', start, end)
+
+        fs = feature_store.open_store(self.features_folder, mmap=False)
+        self.skill_index_to_corrected = fs.skill_index_to_corrected
+        self.prof_index_to_prof_name = fs.prof_index_to_prof_name
+        skills_count, profs_count = len(self.skill_index_to_corrected), len(self.prof_index_to_prof_name)
+
+        window = snapshots.window_aggregates(self.features_folder, start, end)
+        if window is None:
+            raise ValueError(f'There are no weekly partitions in window {start} - {end}')
+
+        total = window.row_count
+        self.matrix = incremental.pad(window.matrix, (skills_count, profs_count))
+        self.skill_df = self._create_skill_df(self.skill_index_to_corrected,
+            incremental.pad(window.skill_vacancy_counts, (skills_count,)) / total,
+            incremental.sketch_quantiles(window.skill_sketches, window.skill_salary_counts,
+                                         self.min_vacancies_for_skill))
+        self.prof_df = self._create_prof_df(incremental.pad(window.prof_vacancy_counts, (profs_count,)) / total,
+            incremental.sketch_quantiles(window.prof_sketches, window.prof_salary_counts))
+        self.update_skill_df()
+        self.update_prof_df()
+
+        output_folder = output_folder or os.path.join(self.features_folder, 'snapshots', f'{start}_{end}')
+        os.makedirs(output_folder, exist_ok=True)
+        self.skill_df.to_csv(os.path.join(output_folder, 'skills.csv'), index=False, encoding='utf-8')
+        self.prof_df.to_csv(os.path.join(output_folder, 'prof.csv'), index=False, encoding='utf-8')
+        feature_store.save_array(output_folder, 'matrix', self.matrix)
+
+        log.info('Assembled window %s - %s: %s vacancies', start, end, total)
+
+        return output_folder
+
+    def process_incremental(self) -> None:
+        """
+            Fold only new vacancies into aggregates of previous runs and emit the same output files.
+            Skill and profession ids are stable across runs.
+            Frequencies and the matrix are equal to full processing (the same denominator: rows of vacancies),
+            salary quantiles are approximate: they are calculated via mergeable sketches.
+            Full processing is made if there is no state or config files are changed
+        """
+
+        state = incremental.load_state(self.features_folder)
+        if state is None or state.config_hash != incremental.config_hash(self.config_folder):
+            log.info('No valid incremental state, full processing...')
+            self.process()
+            return
+
+        self.df = self.df[~self.df['vacancy_id'].astype(str).isin(state.vacancy_ids)].reset_index(drop=True)
+        log.info('Incremental processing: %s new vacancies, %s processed before',
+                 self.df.shape[0], state.vacancy_count)
+        if self.df.shape[0] == 0:
+            log.info('Nothing to process')
+            return
+
+        self._fold_state(state)
+
+        self._save_skill_index()
+        self._save_prof_index()
+
+        filename = os.path.join(self.features_folder, 'vacancy_profset.csv')
+        self.df[['vacancy_id', 'prof_set']].to_csv(filename, index=False, encoding='utf-8', 
+                                                   mode='a', header=not os.path.isfile(filename))
+
+        total = state.row_count
+        self.skill_df = self._create_skill_df(self.skill_index_to_corrected, 
+            state.skill_vacancy_counts / total,
+            incremental.sketch_quantiles(state.skill_sketches, state.skill_salary_counts, 
+                                         self.min_vacancies_for_skill))
+        self.prof_df = self._create_prof_df(state.prof_vacancy_counts / total,
+            incremental.sketch_quantiles(state.prof_sketches, state.prof_salary_counts))
+
+        self.matrix = state.matrix
+        feature_store.save_array(self.features_folder, 'matrix', self.matrix)
+
+        self.update_skill_df()
+        self.save_skill_df()
+
+        self.update_prof_df()
+        self.save_prof_df()
+
+        incremental.save_state(self.features_folder, state)
+        self.weekly_partitions_processing(replace=False)
+
+        log.info('Incremental feature procissing completed')
+
+    # independent branches of process(): attributes and columns of self.df they produce,
+    #  every branch depends only on self.df and config
+    BRANCHES = {
+        'skills_processing': (['skill_counts', 'skill_original_to_index', 'skill_index_to_corrected',
+                               'vacancy_skill', 'skill_df'], ['skill_set']),
+        'professions_processing': (['prof_index_to_prof_name', 'vacancy_prof', 'prof_df', 'profession_rules'],
+                                   ['prof_set']),
+    }
+
+    def _run_branch(self, method: str) -> Tuple[dict, dict]:
+        """Run branch without saving (in a worker process), returns its attributes and columns"""
+
+        getattr(self, method)(save=False)
+        attributes, columns = self.BRANCHES[method]
+
+        return {k: getattr(self, k) for k in attributes}, {k: self.df[k] for k in columns}
+
+    def branches_processing(self, max_workers: int = None) -> None:
+        """
+            Run skills_processing and professions_processing concurrently on a process pool
+            and join their results. Files are saved by this process
+            max_workers: 1 for sequential run in this process
+        """
+
+        # vacancies are loaded once and passed to workers
+        log.info('Processing branches for %s vacancies...', self.df.shape[0])
+
+        results = parallel.run_tasks({m: (self._run_branch, (m,)) for m in self.BRANCHES}, max_workers)
+        for attributes, columns in results.values():
+            for k, v in attributes.items():
+                setattr(self, k, v)
+            for k, v in columns.items():
+                self.df[k] = v
+
+        self._save_skill_index()
+        self._save_professions()
+
+    def process(self, max_workers: int = None) -> None:
+        """
+            Conduct all process. Input and output date in files
+            max_workers: process pool size for independent branches, 1 for sequential run
+        """
+
+        self.branches_processing(max_workers)
 
         self.rel_matrix_processing()
+        self.skill_graph_processing()
         # tf-ifd не зашло, просто раскиданные точки
         # self.rel_matrix_tfidf_processing('name_lemm')
         # self.rel_matrix_tfidf_processing('description_lemm')
@@ -557,6 +872,10 @@ class FeaturesProcessor:
 
         self.update_prof_df()
         self.save_prof_df()
+
+        # aggregates for the next incremental run and time windows
+        incremental.save_state(self.features_folder, self._create_state())
+        self.weekly_partitions_processing()
         
         log.info('Feature procissing completed')
 
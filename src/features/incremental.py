@@ -0,0 +1,149 @@
+"""
+Mergeable aggregates of feature processing for incremental recomputation
+
+State is saved to features_folder/'features_state.pkl' after every run of FeaturesProcessor.
+Incremental run folds only new vacancies (by vacancy_id) into the state:
+    - counts of original skill names, skill and profession vacancy and salary counts
+    - count of vacancy rows, the denominator of frequencies (as rows of full processing)
+    - skill-profession co-occurrence matrix
+    - salary quantile sketches of skills and professions
+Skill and profession indices of previous runs are kept, new ones are appended.
+Counts are exact, so frequencies and the matrix are equal to full processing of all vacancies,
+salary quantiles are approximate (sketches are merged, not recalculated from all salaries).
+
+The state is valid only for the same config files (skill aliases, professions, rules),
+if config is changed full processing is required.
+
+"""
+
+import copy
+from dataclasses import dataclass, field
+import hashlib
+import os
+import pickle
+from typing import Dict, List, Optional, Set
+import numpy as np
+from src.utils.quantile_sketch import QuantileSketch
+
+STATE_FILENAME = 'features_state.pkl'
+CONFIG_FILES = ['professions.json', 'profession_rules.json', 'skill_aliases.json']
+
+
+@dataclass
+class FeaturesState:
+    config_hash : str = None
+    vacancy_ids : Set[str] = field(default_factory=lambda: set())
+    # original skill name -> count of vacancies, ordered as skill_original_to_index
+    original_counts : Dict[str, int] = field(default_factory=lambda: {})
+    prof_names : List[str] = field(default_factory=lambda: [])
+    skill_vacancy_counts : np.ndarray = None
+    skill_salary_counts : np.ndarray = None
+    prof_vacancy_counts : np.ndarray = None
+    prof_salary_counts : np.ndarray = None
+    row_count : int = 0
+    matrix : np.ndarray = None
+    skill_sketches : Dict[int, QuantileSketch] = field(default_factory=lambda: {})
+    prof_sketches : Dict[int, QuantileSketch] = field(default_factory=lambda: {})
+
+    @property
+    def vacancy_count(self) -> int:
+        return len(self.vacancy_ids)
+
+
+def config_hash(config_folder: str) -> str:
+    """Hash of config files content affecting indices"""
+
+    md5 = hashlib.md5()
+    for fn in CONFIG_FILES:
+        filename = os.path.join(config_folder, fn)
+        if os.path.isfile(filename):
+            with open(filename, 'rb') as f:
+                md5.update(f.read())
+
+    return md5.hexdigest()
+
+
+def load_state(features_folder: str) -> Optional[FeaturesState]:
+    filename = os.path.join(features_folder, STATE_FILENAME)
+    if not os.path.isfile(filename):
+        return None
+
+    with open(filename, 'rb') as f:
+        state = pickle.load(f)
+
+    # states of previous versions have no salary counts of professions and row count
+    return state if is_current(state) else None
+
+
+def is_current(state: FeaturesState) -> bool:
+    """State has all aggregates of the current version"""
+    return state.matrix is None or (state.prof_salary_counts is not None and state.row_count > 0)
+
+
+def save_state(features_folder: str, state: FeaturesState) -> None:
+    filename = os.path.join(features_folder, STATE_FILENAME)
+    with open(filename + '.tmp', 'wb') as f:
+        pickle.dump(state, f)
+    os.replace(filename + '.tmp', filename)
+
+
+def pad(array: np.ndarray, shape: tuple) -> np.ndarray:
+    """Extend array with zeros up to shape (new skills or professions)"""
+
+    if array.shape == tuple(shape):
+        return array
+    if any(x > y for x, y in zip(array.shape, shape)):
+        raise ValueError(f'Can not pad array of shape {array.shape} to {shape}')
+
+    result = np.zeros(shape, dtype=array.dtype)
+    result[tuple(slice(0, x) for x in array.shape)] = array
+    return result
+
+
+def merge_aggregates(target: FeaturesState, source: FeaturesState) -> FeaturesState:
+    """
+        Sum aggregates of source into target (target indices are prefix of source indices)
+        Only aggregates are merged, config_hash, original_counts and prof_names are not changed
+    """
+
+    if target.matrix is None:
+        target.skill_vacancy_counts = source.skill_vacancy_counts.copy()
+        target.skill_salary_counts = source.skill_salary_counts.copy()
+        target.prof_vacancy_counts = source.prof_vacancy_counts.copy()
+        target.prof_salary_counts = source.prof_salary_counts.copy()
+        target.matrix = source.matrix.copy()
+    else:
+        target.skill_vacancy_counts = pad(target.skill_vacancy_counts, source.skill_vacancy_counts.shape) + \
+                                        source.skill_vacancy_counts
+        target.skill_salary_counts = pad(target.skill_salary_counts, source.skill_salary_counts.shape) + \
+                                        source.skill_salary_counts
+        target.prof_vacancy_counts = pad(target.prof_vacancy_counts, source.prof_vacancy_counts.shape) + \
+                                        source.prof_vacancy_counts
+        target.prof_salary_counts = pad(target.prof_salary_counts, source.prof_salary_counts.shape) + \
+                                        source.prof_salary_counts
+        target.matrix = pad(target.matrix, source.matrix.shape) + source.matrix
+
+    merge_sketches(target.skill_sketches, source.skill_sketches)
+    merge_sketches(target.prof_sketches, source.prof_sketches)
+    target.vacancy_ids |= source.vacancy_ids
+    target.row_count += source.row_count
+
+    return target
+
+
+def merge_sketches(target: Dict[int, QuantileSketch], source: Dict[int, QuantileSketch]) -> None:
+    """Merge sketches of new vacancies into the state sketches"""
+
+    for k, v in source.items():
+        if k in target:
+            target[k].merge(v)
+        else:
+            target[k] = copy.deepcopy(v)
+
+
+def sketch_quantiles(sketches: Dict[int, QuantileSketch], salary_counts: np.ndarray,
+                     min_vacancies: int = 0) -> Dict[int, tuple]:
+    """Quantiles (0.25, 0.50, 0.75) as FeaturesProcessor._salary_quantiles returns"""
+
+    return {k: tuple(v.quantile([0.25, 0.50, 0.75]))
+            for k, v in sketches.items() if salary_counts[k] > min_vacancies}
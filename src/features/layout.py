@@ -0,0 +1,203 @@
+"""
+2D layout of the skill map (x, y of plot_df files)
+
+Layout is Barnes-Hut t-SNE (O(n log n) per iteration) of skill vectors of a variant:
+    - 'tnse-none', 'tnse-prof': rows of normalized skill x profession matrix
+    - 'als-skill': ALS embeddings of the skill normalized matrix
+                   (feature store 'skill_embeddings' of embeddings.py if they exist)
+Coordinates of all skills of every variant are saved to 'layout-<alg>-<norm>.csv' [skill_name, x, y].
+
+Incremental re-layout: if the layout file of the previous run exists, t-SNE starts from previous coordinates
+(new skills are placed at the mean of their nearest known skills), without early exaggeration and with
+fewer iterations. The result is aligned to the previous layout by rotation and shift (Procrustes),
+so the map of returning users stays the same.
+
+Exsample of using:
+
+    layout_processing('data/features', 'data/plot_df')
+
+    # cold and warm layout time and stability
+    python -m src.features.layout data/features
+
+"""
+
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from sklearn.manifold import TSNE
+from src.features import embeddings, feature_store
+from src.utils.logger import configurate_logger
+
+log = configurate_logger('Layout')
+
+# (algorithm, normalization) of the front files
+LAYOUT_VARIANTS = [('tnse', 'none'), ('tnse', 'prof'), ('als', 'skill')]
+# iterations of cold and warm start (sklearn runs at least 250)
+COLD_ITERATIONS = 1000
+WARM_ITERATIONS = 300
+
+
+def layout_filename(plot_df_folder: str, algorithm: str, norm_type: str) -> str:
+    return os.path.join(plot_df_folder, f'layout-{algorithm}-{norm_type}.csv')
+
+
+def skill_vectors(matrix: np.ndarray, algorithm: str, norm_type: str, rank: int = 8) -> np.ndarray:
+    """Input of t-SNE of the variant"""
+
+    A = embeddings.normalize_matrix(matrix, norm_type)
+    if algorithm == 'tnse':
+        return A
+    elif algorithm == 'als':
+        return embeddings.fit(A, 'als', rank).rows
+    else:
+        raise ValueError("algorithm parametr must be ('tnse', 'als')")
+
+
+def warm_start(names: List[str], vectors: np.ndarray, previous: pd.DataFrame, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Initial coordinates of skills by previous layout [skill_name, x, y]
+        and mask of skills of the previous layout.
+        New skills are placed at the mean of k nearest (cosine of vectors) known skills
+    """
+
+    previous_xy = previous.drop_duplicates('skill_name').set_index('skill_name')[['x', 'y']]
+    known = pd.Index(names).isin(previous_xy.index)
+    init = np.zeros((len(names), 2))
+    init[known] = previous_xy.loc[np.array(names, dtype=object)[known]].to_numpy()
+
+    if (~known).any() and known.any():
+        unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        similarity = unit[~known] @ unit[known].T
+        k = min(k, similarity.shape[1])
+        nearest = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        init[~known] = init[known][nearest].mean(axis=1)
+
+    return init, known
+
+
+def procrustes_align(xy: np.ndarray, reference: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Rotate (reflect) and shift xy to fit reference on points of mask"""
+
+    if mask.sum() < 3:
+        return xy
+
+    a, b = xy[mask], reference[mask]
+    a_mean, b_mean = a.mean(axis=0), b.mean(axis=0)
+    U, _, Vt = np.linalg.svd((a - a_mean).T @ (b - b_mean))
+    return (xy - a_mean) @ (U @ Vt) + b_mean
+
+
+def tsne(vectors: np.ndarray, init: np.ndarray = None, perplexity: float = 30, seed: int = 0) -> np.ndarray:
+    """Barnes-Hut t-SNE, warm start from init coordinates if they are set"""
+
+    perplexity = min(perplexity, max(1, (vectors.shape[0] - 1) / 3))
+    if init is None:
+        model = TSNE(n_components=2, perplexity=perplexity, n_iter=COLD_ITERATIONS, init='pca',
+                     learning_rate='auto', method='barnes_hut', random_state=seed)
+    else:
+        # learning rate of the cold start ('auto' depends on early exaggeration)
+        model = TSNE(n_components=2, perplexity=perplexity, n_iter=WARM_ITERATIONS, init=init,
+                     early_exaggeration=1.0, learning_rate=max(vectors.shape[0] / 12 / 4, 50),
+                     method='barnes_hut', random_state=seed)
+
+    return model.fit_transform(vectors.astype(np.float32))
+
+
+def layout(names: List[str], vectors: np.ndarray, previous: pd.DataFrame = None) -> pd.DataFrame:
+    """Layout [skill_name, x, y], incremental if previous layout is set"""
+
+    if previous is None or previous.shape[0] == 0:
+        xy = tsne(vectors)
+    else:
+        init, known = warm_start(names, vectors, previous)
+        xy = procrustes_align(tsne(vectors, init), init, known)
+
+    return pd.DataFrame({'skill_name': names, 'x': xy[:, 0], 'y': xy[:, 1]})
+
+
+def stability(current: pd.DataFrame, previous: pd.DataFrame) -> float:
+    """Median shift of skills of both layouts relative to the median distance to the layout center"""
+
+    merged = current.merge(previous, on='skill_name', suffixes=('', '_prev'))
+    shift = np.hypot(merged.x - merged.x_prev, merged.y - merged.y_prev)
+    radius = np.hypot(merged.x_prev - merged.x_prev.mean(), merged.y_prev - merged.y_prev.mean())
+    return float(np.median(shift) / max(np.median(radius), 1e-12))
+
+
+def layout_processing(features_folder: str = 'data/features', plot_df_folder: str = 'data/plot_df',
+                      incremental: bool = True) -> Dict[str, float]:
+    """
+        Layout of every variant, save layout files and plot_df files of the front
+        incremental: start from layouts of the previous run if they exist
+        Returns time of every variant in seconds
+    """
+
+    fs = feature_store.open_store(features_folder)
+    matrix = np.asarray(fs.matrix)
+    prof_names = fs.prof_names.to_list()
+    names = fs.skill_names.to_list()
+    skill_df = pd.read_csv(os.path.join(features_folder, 'skills.csv'))
+    os.makedirs(plot_df_folder, exist_ok=True)
+
+    seconds = {}
+    for algorithm, norm_type in LAYOUT_VARIANTS:
+        filename = layout_filename(plot_df_folder, algorithm, norm_type)
+        previous = pd.read_csv(filename) if incremental and os.path.isfile(filename) else None
+
+        start = time.perf_counter()
+        if (algorithm, norm_type) == embeddings.EMBEDDINGS_VARIANT and 'skill_embeddings' in fs:
+            vectors = np.asarray(fs.array('skill_embeddings'))
+        else:
+            vectors = skill_vectors(matrix, algorithm, norm_type)
+        df = layout(names, vectors, previous)
+        seconds[f'{algorithm}-{norm_type}'] = time.perf_counter() - start
+        log.info('Layout %s-%s (%s start): %.1f s', algorithm, norm_type,
+                 'cold' if previous is None else 'warm', seconds[f'{algorithm}-{norm_type}'])
+
+        df.to_csv(filename, index=False, encoding='utf-8')
+        skill_xy = df[['x', 'y']].to_numpy()
+        for top in embeddings.PLOT_TOPS:
+            embeddings.skill_plot_df(skill_df, skill_xy, prof_names, top).to_csv(
+                os.path.join(plot_df_folder, f'{algorithm}-{norm_type}-{top}-skill.csv'))
+
+        if (algorithm, norm_type) == LAYOUT_VARIANTS[0]:
+            embeddings.landscape_plot_df(skill_df, skill_xy).to_csv(os.path.join(plot_df_folder, 'landscape.csv'))
+
+    return seconds
+
+
+if __name__ == '__main__':
+
+    # positional arguments: features folder, count of synthetic skills (skills of the store by default)
+    args = [x for x in sys.argv[1:] if not x.startswith('--')]
+    features_folder = args[0] if len(args) > 0 else 'data/features'
+    matrix = np.asarray(feature_store.open_store(features_folder).matrix, dtype=np.float64)
+
+    if len(args) > 1:
+        rng = np.random.default_rng(0)
+        matrix = rng.poisson(matrix[rng.integers(0, matrix.shape[0], int(args[1]))] + 0.1).astype(np.float64)
+
+    vectors = skill_vectors(matrix, 'tnse', 'prof')
+    names = [f'skill{i}' for i in range(vectors.shape[0])]
+
+    # next week: counts changed by noise, 5% of skills are new, 5% are gone
+    rng = np.random.default_rng(1)
+    next_matrix = rng.poisson(matrix * 1.1 + 0.05).astype(np.float64)
+    next_vectors = skill_vectors(next_matrix, 'tnse', 'prof')
+    next_names = [f'new{i}' if rng.random() < 0.05 else name for i, name in enumerate(names)]
+    keep = rng.random(len(names)) >= 0.05
+
+    start = time.perf_counter()
+    previous = layout(names, vectors)
+    print(f'{len(names)} skills, cold layout: {time.perf_counter() - start:.1f} s')
+
+    start = time.perf_counter()
+    cold = layout(list(np.array(next_names)[keep]), next_vectors[keep])
+    print(f'next week, cold layout: {time.perf_counter() - start:.1f} s, shift {stability(cold, previous):.3f}')
+
+    start = time.perf_counter()
+    warm = layout(list(np.array(next_names)[keep]), next_vectors[keep], previous)
+    print(f'next week, warm layout: {time.perf_counter() - start:.1f} s, shift {stability(warm, previous):.3f}')
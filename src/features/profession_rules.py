@@ -0,0 +1,144 @@
+"""
+Rule base for professions of vacancies (improving 'prof_set' column)
+
+Rules are data (config_folder/'profession_rules.json') and applied in order.
+Each rule adds the profession to vacancies which name matches its keywords:
+    - mode 'and': every word of the keyword phrase (splitted by space or '-')
+                  is a substring of the lowercase name
+    - mode 'kw': ' keyword ' is a substring of the simplified name
+                 (lowercase, punctuation replaced by spaces, surrounded by spaces)
+    - only_empty: the rule is applied only to vacancies without professions found by previous rules
+Vacancies without any matched rule keep original 'prof_set'.
+
+Names are normalized once, every keyword is a vectorized str.contains mask
+(masks of repeated words are reused), so the rule base is a few vectorized passes over the frame.
+Hits and time of every keyword are reported.
+
+Exsample of using:
+
+    engine = ProfessionRuleEngine(load_rules('cnf/profession_rules.json'))
+    df['prof_set'] = engine.apply(df['name'], df['prof_set'])
+    print(engine.report_str())
+
+"""
+
+from dataclasses import dataclass, field
+import re
+import time
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from src.utils import config
+
+
+@dataclass
+class ProfessionRule:
+    profession : str = None
+    keywords : List[str] = field(default_factory=lambda: [])
+    mode : str = 'and'
+    only_empty : bool = False
+    group : str = None
+
+
+def load_rules(filename: str) -> List[ProfessionRule]:
+    """Load rules from json file (list of ProfessionRule fields)"""
+
+    rules = []
+    for row in config.load(filename):
+        rule = ProfessionRule(**row)
+        if rule.mode not in {'and', 'kw'}:
+            raise ValueError(f'Invalid rule mode "{rule.mode}" for profession "{rule.profession}"')
+        rules.append(rule)
+
+    return rules
+
+
+class ProfessionRuleEngine:
+    """Compiled and vectorized profession rule base"""
+
+    _SIMPLIFY_TABLE = str.maketrans({c: ' ' for c in '",()\\-/.'})
+
+    def __init__(self, rules: List[ProfessionRule]):
+        self.rules = rules
+        self.professions = list(dict.fromkeys(r.profession for r in rules))
+        self.report : pd.DataFrame = None
+
+    def _compile(self, names: pd.Series) -> callable:
+        """
+            Normalize names once and return function (rule, keywords) -> boolean mask
+            Masks of repeated words are cached
+        """
+
+        lower_names = names.str.lower()
+        simple_names = ' ' + lower_names.str.translate(self._SIMPLIFY_TABLE) + ' '
+
+        cache : Dict[tuple, np.ndarray] = {}
+        def contains(s: pd.Series, key: str, text: str) -> np.ndarray:
+            if (key, text) not in cache:
+                cache[(key, text)] = s.str.contains(text, regex=False, na=False).to_numpy(dtype=bool)
+            return cache[(key, text)]
+
+        def keyword_mask(rule: ProfessionRule, keywords: str) -> np.ndarray:
+            if rule.mode == 'kw':
+                return contains(simple_names, 'kw', f' {keywords.lower()} ')
+
+            mask = np.ones(names.shape[0], dtype=bool)
+            for kw in re.split(' |-', keywords):
+                mask &= contains(lower_names, 'and', kw.lower())
+            return mask
+
+        return keyword_mask
+
+    def apply(self, names: pd.Series, prof_sets: pd.Series) -> pd.Series:
+        """
+            Apply rules to vacancy names
+
+            Returns new prof_set series, report of rules is saved to self.report:
+                [group, profession, mode, only_empty, keywords, hits, time_ms]
+        """
+
+        start = time.perf_counter()
+        keyword_mask = self._compile(names)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        prof_index = {p: i for i, p in enumerate(self.professions)}
+        hits = np.zeros((names.shape[0], len(self.professions)), dtype=bool)
+        has_any = np.zeros(names.shape[0], dtype=bool)
+
+        report = []
+        for rule in self.rules:
+            for keywords in (rule.keywords or [rule.profession]):
+                start = time.perf_counter()
+                mask = keyword_mask(rule, keywords)
+                if rule.only_empty:
+                    mask = mask & ~has_any
+                hits[:, prof_index[rule.profession]] |= mask
+                has_any |= mask
+                report.append([rule.group, rule.profession, rule.mode, rule.only_empty,
+                               keywords, int(mask.sum()), (time.perf_counter() - start) * 1000])
+
+        self.report = pd.DataFrame(report,
+            columns=['group', 'profession', 'mode', 'only_empty', 'keywords', 'hits', 'time_ms'])
+        self.report.attrs['compile_ms'] = compile_ms
+        self.report.attrs['processed'] = int(has_any.sum())
+        self.report.attrs['total'] = int(names.shape[0])
+
+        rule_sets = [set() for _ in range(names.shape[0])]
+        for row, col in zip(*np.nonzero(hits)):
+            rule_sets[row].add(self.professions[col])
+
+        return pd.Series([r if len(r) > 0 else p for r, p in zip(rule_sets, prof_sets)],
+                         index=prof_sets.index)
+
+    def report_str(self) -> str:
+        """Human readable report of the last apply"""
+
+        if self.report is None:
+            return 'Rules were not applied'
+
+        lines = [f'{r.profession} [{r.mode}{", only_empty" if r.only_empty else ""}] "{r.keywords}": '
+                 f'{r.hits} hits, {r.time_ms:.2f} ms' for r in self.report.itertuples()]
+        lines.append(f'Compile: {self.report.attrs["compile_ms"]:.2f} ms, '
+                     f'processed: {self.report.attrs["processed"]} of {self.report.attrs["total"]} rows')
+
+        return '\n'.join(lines)
@@ -0,0 +1,128 @@
+"""
+Skill co-occurrence graph on sparse algebra
+
+Co-occurrence of skills is a product of the binary vacancy-skill incidence matrix:
+    cooccurrence = V.T @ V  (csr_matrix[skill_id, skill_id], diagonal is vacancy count of the skill)
+Pointwise mutual information of a pair of skills:
+    pmi = log(cooccurrence * vacancy_count / (count_i * count_j))
+Only pairs with positive pmi and at least min_count common vacancies are kept,
+every row is pruned to top_k neighbours, so the graph stays sparse for any number of skills.
+
+FeaturesProcessor.skill_graph_processing saves to the feature store:
+    - 'skill_pmi': pruned pmi (csr_matrix[skill_id, skill_id])
+    - 'skill_cooccurrence': vacancy counts of the same pairs
+
+Validation against hand-maintained related skills (config_folder/'skill_pairs.json'):
+mean reciprocal rank of the pair skill among neighbours and share of pairs found in top_k.
+
+Exsample of using:
+
+    fs = feature_store.open_store('data/features')
+    neighbours(fs.sparse('skill_pmi'), fs.skill_original_to_index['Python'])
+
+    python -m src.features.skill_graph
+
+"""
+
+import os
+import sys
+from typing import Dict, List, Mapping, Tuple
+import numpy as np
+from scipy import sparse
+from src.utils import config
+
+
+def cooccurrence(vacancy_skill: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Skill-skill co-occurrence counts (diagonal is vacancy count of the skill)"""
+
+    binary = (vacancy_skill > 0).astype(np.float64)
+    return (binary.T @ binary).tocsr()
+
+
+def pmi(cooc: sparse.csr_matrix, vacancy_count: int, min_count: int = 2) -> sparse.csr_matrix:
+    """
+        Positive pointwise mutual information of skill pairs with at least min_count common vacancies,
+        diagonal is removed
+    """
+
+    counts = cooc.diagonal()
+    coo = sparse.triu(cooc, k=1).tocoo()
+    mask = coo.data >= min_count
+    rows, cols, data = coo.row[mask], coo.col[mask], coo.data[mask]
+
+    values = np.log(data * vacancy_count / (counts[rows] * counts[cols]))
+    mask = values > 0
+    rows, cols, values = rows[mask], cols[mask], values[mask]
+
+    # symmetric matrix from upper triangle
+    return sparse.csr_matrix((np.r_[values, values], (np.r_[rows, cols], np.r_[cols, rows])), shape=cooc.shape)
+
+
+def top_k_per_row(matrix: sparse.csr_matrix, top_k: int) -> sparse.csr_matrix:
+    """Keep top_k biggest values of every row (ties by column index)"""
+
+    matrix = sparse.csr_matrix(matrix)
+    matrix.sort_indices()
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+
+    # sort by row, then by value descending, rank is position inside the row
+    order = np.lexsort((-matrix.data, rows))
+    rank = np.arange(order.shape[0]) - matrix.indptr[rows[order]]
+    keep = order[rank < top_k]
+
+    return sparse.csr_matrix((matrix.data[keep], (rows[keep], matrix.indices[keep])), shape=matrix.shape)
+
+
+def neighbours(graph: sparse.csr_matrix, skill_id: int) -> List[Tuple[int, float]]:
+    """Neighbours of the skill ordered by weight descending"""
+
+    start, end = graph.indptr[skill_id], graph.indptr[skill_id + 1]
+    indices, data = np.asarray(graph.indices[start:end]), np.asarray(graph.data[start:end])
+    order = np.argsort(-data, kind='stable')
+
+    return list(zip(indices[order].tolist(), data[order].tolist()))
+
+
+def validate(graph: sparse.csr_matrix, pairs: List[List[str]],
+             skill_original_to_index: Mapping[str, int]) -> Dict[str, float]:
+    """
+        Compare graph with reference pairs of related skills (both directions of each pair).
+        Pairs with unknown skills are skipped.
+
+        Returns:
+            - pairs: count of checked pairs
+            - mrr: mean reciprocal rank (0 if the pair skill is not a neighbour)
+            - hit_rate: share of pairs found among neighbours
+    """
+
+    pairs = {tuple(sorted(p)) for p in pairs if p[0] != p[1]}
+    pairs = [p for p in pairs if p[0] in skill_original_to_index and p[1] in skill_original_to_index]
+
+    reciprocal_ranks = []
+    for a, b in pairs:
+        a, b = skill_original_to_index[a], skill_original_to_index[b]
+        for x, y in [(a, b), (b, a)]:
+            ranked = [i for i, _ in neighbours(graph, x)]
+            reciprocal_ranks.append(1 / (ranked.index(y) + 1) if y in ranked else 0.0)
+
+    reciprocal_ranks = np.array(reciprocal_ranks)
+    return {
+        'pairs': len(pairs),
+        'mrr': float(reciprocal_ranks.mean()) if len(pairs) > 0 else 0.0,
+        'hit_rate': float((reciprocal_ranks > 0).mean()) if len(pairs) > 0 else 0.0,
+    }
+
+
+if __name__ == '__main__':
+
+    from src.features import feature_store
+
+    # positional arguments: features folder, config folder (command-line options are parsed by logger)
+    args = [x for x in sys.argv[1:] if not x.startswith('--')]
+    features_folder = args[0] if len(args) > 0 else 'data/features'
+    config_folder = args[1] if len(args) > 1 else 'cnf'
+
+    fs = feature_store.open_store(features_folder)
+    result = validate(fs.sparse('skill_pmi'), config.load(os.path.join(config_folder, 'skill_pairs.json')),
+                      fs.skill_original_to_index)
+    print(f'pairs={result["pairs"]}, mrr={result["mrr"]:.3f}, hit_rate={result["hit_rate"]:.3f}')
@@ -0,0 +1,114 @@
+"""
+Skill name normalization shared by feature processing and inference
+
+    - alias map: lowercase alias -> canonical skill name (config_folder/'skill_aliases.json')
+    - simplify: canonical lowercase name without spaces and spec-symbols,
+                skills with the same simplified name are one skill
+    - SkillResolver: free-text skill name -> skill index of the feature store
+
+Exsample of using:
+
+    alias_map = skill_names.load_alias_map('cnf/skill_aliases.json')
+    skill_names.simplify('Machine-Learning', alias_map)
+
+    fs = feature_store.open_store('data/features')
+    resolver = SkillResolver(fs.skill_original_to_index, alias_map)
+    resolver.resolve(['python', 'Машинное обучение', 'unknown skill'])
+
+"""
+
+import hashlib
+import os
+import pickle
+from typing import Dict, List, Mapping, Optional, Tuple
+import numpy as np
+from src.utils import config
+
+ALIAS_CACHE_FILENAME = 'skill_aliases.pkl'
+
+
+def build_alias_map(skill_aliases: List[List[str]]) -> Dict[str, str]:
+    """Lowercase alias -> canonical skill name, the first alias group containing the alias wins"""
+
+    alias_map = {}
+    for group in skill_aliases:
+        for alias in group:
+            alias_map.setdefault(alias.lower(), group[0])
+
+    return alias_map
+
+
+def _source_hash(filename: str) -> str:
+    with open(filename, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def _read_alias_cache(cache_filename: str) -> dict:
+    if not os.path.isfile(cache_filename):
+        return {}
+    with open(cache_filename, 'rb') as f:
+        return pickle.load(f)
+
+
+def load_alias_map(filename: str, cache_folder: Optional[str] = None) -> Dict[str, str]:
+    """
+        Load alias map of aliases file.
+        The dictionary is read from 'skill_aliases.pkl' inside cache_folder if it was saved
+        for the same content of the aliases file (see save_alias_map), the file is not written
+    """
+
+    if cache_folder is not None:
+        cached = _read_alias_cache(os.path.join(cache_folder, ALIAS_CACHE_FILENAME))
+        if cached.get('source_hash') == _source_hash(filename):
+            return cached['alias_map']
+
+    return build_alias_map(config.load(filename))
+
+
+def save_alias_map(filename: str, alias_map: Dict[str, str], cache_folder: str) -> None:
+    """Save alias map of aliases file to 'skill_aliases.pkl' inside cache_folder (if it exists) when it is stale"""
+
+    cache_filename = os.path.join(cache_folder, ALIAS_CACHE_FILENAME)
+    source_hash = _source_hash(filename)
+    if not os.path.isdir(cache_folder) or _read_alias_cache(cache_filename).get('source_hash') == source_hash:
+        return
+
+    with open(cache_filename, 'wb') as f:
+        pickle.dump({'source_hash': source_hash, 'alias_map': alias_map}, f)
+
+
+def simplify(name: str, alias_map: Mapping[str, str]) -> str:
+    """Canonical lowercase name without spaces and spec-symbols"""
+
+    name = alias_map.get(name.lower(), name)
+    return name.lower().replace(' ', '').replace('-', '').replace('/','').replace(':','')
+
+
+class SkillResolver:
+    """Free-text skill names to skill indices: exact original name, then simplified name"""
+
+    def __init__(self, skill_original_to_index: Mapping[str, int], alias_map: Mapping[str, str]):
+        self.alias_map = alias_map
+        self.original_to_index = dict(skill_original_to_index)
+        self.simplified_to_index = {}
+        for name, index in self.original_to_index.items():
+            self.simplified_to_index.setdefault(simplify(name, alias_map), index)
+
+    def get(self, name: str) -> Optional[int]:
+        index = self.original_to_index.get(name)
+        if index is None:
+            index = self.simplified_to_index.get(simplify(name.strip(), self.alias_map))
+        return index
+
+    def resolve(self, names: List[str]) -> Tuple[np.ndarray, List[str]]:
+        """Unique indices of known names and list of unknown names"""
+
+        indices, unknown = [], []
+        for name in names:
+            index = self.get(name)
+            if index is None:
+                unknown.append(name)
+            else:
+                indices.append(index)
+
+        return np.unique(np.array(indices, dtype=np.int64)), unknown
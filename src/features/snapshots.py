@@ -0,0 +1,146 @@
+"""
+Time-windowed snapshots of the landscape from weekly partitioned aggregates
+
+FeaturesProcessor saves aggregates (see incremental.py) of vacancies published in every week
+to features_folder/'weekly/<week>.pkl', week is the date of its Monday ('YYYY-MM-DD').
+Partitions share skill and profession indices of the feature store (shorter arrays are padded),
+so aggregates of any window are sums of its partitions and vacancies are not processed again.
+
+Exsample of using:
+
+    # aggregates of vacancies published in May
+    window = snapshots.window_aggregates('data/features', '2023-05-01', '2023-05-31')
+    window.matrix, window.row_count
+
+    # skills.csv, prof.csv and matrix of the window
+    FeaturesProcessor().window_processing('2023-05-01', '2023-05-31')
+
+    # weekly share of vacancies with skills
+    fs = feature_store.open_store('data/features')
+    snapshots.trend('data/features', 'skill', [fs.skill_original_to_index['Python']])
+
+"""
+
+import os
+import pickle
+import shutil
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from src.features import incremental
+
+PARTITIONS_FOLDER = 'weekly'
+
+
+def week_of(dates: pd.Series) -> pd.Series:
+    """Monday of the week of every date ('YYYY-MM-DD'), NaN for invalid dates"""
+
+    dates = pd.to_datetime(dates, errors='coerce', utc=True).dt.tz_localize(None)
+    weeks = dates.dt.to_period('W-SUN').dt.start_time.dt.strftime('%Y-%m-%d')
+    return weeks.where(dates.notna())
+
+
+def _partition_filename(features_folder: str, week: str) -> str:
+    return os.path.join(features_folder, PARTITIONS_FOLDER, f'{week}.pkl')
+
+
+def partition_weeks(features_folder: str) -> List[str]:
+    """Sorted weeks of saved partitions"""
+
+    folder = os.path.join(features_folder, PARTITIONS_FOLDER)
+    if not os.path.isdir(folder):
+        return []
+
+    return sorted(fn[:-4] for fn in os.listdir(folder) if fn.endswith('.pkl'))
+
+
+def load_partition(features_folder: str, week: str) -> Optional[incremental.FeaturesState]:
+    filename = _partition_filename(features_folder, week)
+    if not os.path.isfile(filename):
+        return None
+
+    with open(filename, 'rb') as f:
+        partition = pickle.load(f)
+
+    if not incremental.is_current(partition):
+        raise ValueError(f'Partition {filename} is saved by a previous version, full processing is required')
+
+    return partition
+
+
+def save_partition(features_folder: str, week: str, partition: incremental.FeaturesState) -> None:
+    filename = _partition_filename(features_folder, week)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename + '.tmp', 'wb') as f:
+        pickle.dump(partition, f)
+    os.replace(filename + '.tmp', filename)
+
+
+def remove_partitions(features_folder: str) -> None:
+    shutil.rmtree(os.path.join(features_folder, PARTITIONS_FOLDER), ignore_errors=True)
+
+
+def window_weeks(features_folder: str, start: str = None, end: str = None) -> List[str]:
+    """
+        Weeks of partitions in window [start, end] (dates 'YYYY-MM-DD', open if None).
+        Partitions are weekly, so the window is extended to whole weeks
+    """
+
+    start = week_of(pd.Series([start])).iloc[0] if start is not None else None
+    end = week_of(pd.Series([end])).iloc[0] if end is not None else None
+
+    return [w for w in partition_weeks(features_folder)
+            if (start is None or w >= start) and (end is None or w <= end)]
+
+
+def window_aggregates(features_folder: str, start: str = None,
+                      end: str = None) -> Optional[incremental.FeaturesState]:
+    """Sum of partitions in window [start, end], None if there are no partitions"""
+
+    window = None
+    for week in window_weeks(features_folder, start, end):
+        partition = load_partition(features_folder, week)
+        window = partition if window is None else _merge_padded(window, partition)
+
+    return window
+
+
+def _merge_padded(target: incremental.FeaturesState,
+                  source: incremental.FeaturesState) -> incremental.FeaturesState:
+    """Merge partitions with indices of different length (partition of an earlier run can be shorter)"""
+
+    if target.matrix.shape[0] < source.matrix.shape[0] or target.matrix.shape[1] < source.matrix.shape[1]:
+        shape = np.maximum(target.matrix.shape, source.matrix.shape)
+        target.skill_vacancy_counts = incremental.pad(target.skill_vacancy_counts, (shape[0],))
+        target.skill_salary_counts = incremental.pad(target.skill_salary_counts, (shape[0],))
+        target.prof_vacancy_counts = incremental.pad(target.prof_vacancy_counts, (shape[1],))
+        target.prof_salary_counts = incremental.pad(target.prof_salary_counts, (shape[1],))
+        target.matrix = incremental.pad(target.matrix, tuple(shape))
+
+    source.skill_vacancy_counts = incremental.pad(source.skill_vacancy_counts, target.skill_vacancy_counts.shape)
+    source.skill_salary_counts = incremental.pad(source.skill_salary_counts, target.skill_salary_counts.shape)
+    source.prof_vacancy_counts = incremental.pad(source.prof_vacancy_counts, target.prof_vacancy_counts.shape)
+    source.prof_salary_counts = incremental.pad(source.prof_salary_counts, target.prof_salary_counts.shape)
+    source.matrix = incremental.pad(source.matrix, target.matrix.shape)
+
+    return incremental.merge_aggregates(target, source)
+
+
+def trend(features_folder: str, entity: str, ids: List[int], start: str = None, end: str = None) -> pd.DataFrame:
+    """
+        Weekly share of vacancies with skills or professions
+        entity: 'skill' or 'prof'
+        Returns dataframe [week, vacancy_count, <id>...]
+    """
+
+    if entity not in {'skill', 'prof'}:
+        raise ValueError(f'Invalid entity "{entity}", expected "skill" or "prof"')
+
+    rows = []
+    for week in window_weeks(features_folder, start, end):
+        partition = load_partition(features_folder, week)
+        counts = partition.skill_vacancy_counts if entity == 'skill' else partition.prof_vacancy_counts
+        total = partition.row_count
+        rows.append([week, total] + [counts[i] / total if i < counts.shape[0] else 0.0 for i in ids])
+
+    return pd.DataFrame(rows, columns=['week', 'vacancy_count'] + list(ids))
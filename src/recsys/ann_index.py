@@ -0,0 +1,273 @@
+"""
+Nearest-neighbour index of skill vectors ("skills related to X")
+
+Vectors are rows of a feature store array (skill-profession 'matrix' by default,
+skill embeddings when they exist), L2-normalized, so inner product is cosine similarity.
+
+Indices:
+    - ExactIndex: brute force, one BLAS matrix product for a batch of queries (baseline)
+    - IVFIndex: inverted file. Vectors are clustered by spherical k-means, vectors of a cluster
+                are stored contiguously, a query scans only n_probe nearest clusters
+
+Index is saved to its own folder as a feature store ('index.json' with parameters
+and memory-mappable arrays), load_index opens the arrays with mmap.
+
+Exsample of using:
+
+    index = build_index('data/features', kind='ivf')
+    save_index(index, 'data/features/skill_index')
+
+    index = load_index('data/features/skill_index')
+    ids, scores = index.search(queries, k=10)
+    related_skills(index, 'data/features', 'Python', k=10)
+
+    # recall/latency benchmark, optionally on synthetic vectors of the given count
+    python -m src.recsys.ann_index data/features
+    python -m src.recsys.ann_index data/features 20000
+
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from src.features import feature_store
+
+INDEX_META_FILENAME = 'index.json'
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """float32 rows of unit length (zero rows stay zero)"""
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.ascontiguousarray(vectors / np.where(norms > 0, norms, 1))
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and values of k largest values of every row, in descending order"""
+
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+class ExactIndex:
+    """Brute-force inner product search"""
+
+    kind = 'exact'
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, **params) -> 'ExactIndex':
+        return cls(normalize(vectors))
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def search(self, queries: np.ndarray, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """ids and scores [queries, k] of k nearest vectors of every query"""
+        return _top_k(normalize(np.atleast_2d(queries)) @ self.vectors.T, k)
+
+    def params(self) -> dict:
+        return {}
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {'vectors': self.vectors}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], params: dict) -> 'ExactIndex':
+        return cls(arrays['vectors'])
+
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, n_iter: int = 20,
+                     seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Centroids [n_clusters, dim] (unit length) and cluster of every vector"""
+
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(vectors.shape[0], n_clusters, replace=False)].copy()
+    labels = np.full(vectors.shape[0], -1)
+
+    for _ in range(n_iter):
+        new_labels = np.argmax(vectors @ centroids.T, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        # empty clusters are moved to random vectors
+        empty = np.bincount(labels, minlength=n_clusters) == 0
+        sums[empty] = vectors[rng.choice(vectors.shape[0], int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+
+    return centroids, labels
+
+
+class IVFIndex(ExactIndex):
+    """
+        Inverted file index
+        vectors: normalized vectors ordered by cluster, ids: original index of every stored vector,
+        offsets: vectors of cluster c are vectors[offsets[c]:offsets[c+1]]
+    """
+
+    kind = 'ivf'
+
+    def __init__(self, vectors: np.ndarray, ids: np.ndarray, centroids: np.ndarray,
+                 offsets: np.ndarray, n_probe: int = 8):
+        super().__init__(vectors)
+        self.ids = ids
+        self.centroids = centroids
+        self.offsets = offsets
+        self.n_probe = n_probe
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, n_lists: int = None, n_probe: int = 8, seed: int = 0) -> 'IVFIndex':
+        """n_lists: count of clusters, 4 * sqrt(count of vectors) by default"""
+
+        vectors = normalize(vectors)
+        n_lists = min(vectors.shape[0], n_lists or max(1, int(4 * np.sqrt(vectors.shape[0]))))
+        centroids, labels = spherical_kmeans(vectors, n_lists, seed=seed)
+
+        ids = np.argsort(labels, kind='stable')
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+
+        return cls(np.ascontiguousarray(vectors[ids]), ids, centroids, offsets, n_probe)
+
+    def search(self, queries: np.ndarray, k: int = 10, n_probe: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """ids and scores [queries, k], missing neighbours (too few candidates) are -1 with score -inf"""
+
+        queries = normalize(np.atleast_2d(queries))
+        n_probe = min(n_probe or self.n_probe, self.centroids.shape[0])
+        probes = np.argpartition(-(queries @ self.centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+
+        result_ids = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        result_scores = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        starts, ends = self.offsets[:-1], self.offsets[1:]
+
+        for i, (query, probe) in enumerate(zip(queries, probes)):
+            rows = np.concatenate([np.arange(starts[c], ends[c]) for c in probe])
+            if rows.shape[0] == 0:
+                continue
+            top, scores = _top_k((self.vectors[rows] @ query)[np.newaxis, :], k)
+            result_ids[i, :top.shape[1]] = self.ids[rows[top[0]]]
+            result_scores[i, :top.shape[1]] = scores[0]
+
+        return result_ids, result_scores
+
+    def params(self) -> dict:
+        return {'n_probe': self.n_probe}
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {'vectors': self.vectors, 'ids': self.ids, 'centroids': self.centroids, 'offsets': self.offsets}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], params: dict) -> 'IVFIndex':
+        return cls(arrays['vectors'], arrays['ids'], arrays['centroids'], arrays['offsets'], **params)
+
+
+INDEX_KINDS = {cls.kind: cls for cls in [ExactIndex, IVFIndex]}
+
+
+def build_index(features_folder: str = 'data/features', item: str = 'matrix', kind: str = 'ivf', **params) -> ExactIndex:
+    """Index of rows of feature store array item"""
+
+    if kind not in INDEX_KINDS:
+        raise ValueError(f'Unknown index kind "{kind}", expected one of {list(INDEX_KINDS)}')
+
+    fs = feature_store.open_store(features_folder)
+    return INDEX_KINDS[kind].build(fs.array(item), **params)
+
+
+def save_index(index: ExactIndex, folder: str) -> None:
+    os.makedirs(folder, exist_ok=True)
+    for name, array in index.arrays().items():
+        feature_store.save_array(folder, name, array)
+
+    with open(os.path.join(folder, INDEX_META_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump({'kind': index.kind, 'params': index.params()}, f, indent=4)
+
+
+def load_index(folder: str, mmap: bool = True) -> ExactIndex:
+    filename = os.path.join(folder, INDEX_META_FILENAME)
+    if not os.path.isfile(filename):
+        raise ValueError(f'Index does not exist: {folder}')
+
+    with open(filename, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+
+    fs = feature_store.open_store(folder, mmap=mmap)
+    cls = INDEX_KINDS[meta['kind']]
+    return cls.from_arrays({name: fs.array(name) for name in fs.meta['items']}, meta['params'])
+
+
+def related_skills(index: ExactIndex, features_folder: str, skill: str, k: int = 10,
+                   item: str = 'matrix') -> List[Tuple[str, float]]:
+    """k skills nearest to the skill (original name), the skill itself excluded. item: vectors of the index"""
+
+    fs = feature_store.open_store(features_folder)
+    vectors = fs.array(item)
+    if len(index) != vectors.shape[0]:
+        raise ValueError(f'Index of {len(index)} vectors does not match "{item}" of {features_folder}')
+
+    skill_id = fs.skill_original_to_index[skill]
+    ids, scores = index.search(vectors[skill_id], k + 1)
+    return [(fs.skill_names[i], float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0 and i != skill_id][:k]
+
+
+def recall(exact_ids: np.ndarray, ids: np.ndarray) -> float:
+    """Mean share of exact neighbours found"""
+    return float(np.mean([len(np.intersect1d(a, b)) / len(a) for a, b in zip(exact_ids, ids)]))
+
+
+if __name__ == '__main__':
+
+    # positional arguments: features folder, count of synthetic vectors (vectors of the store by default)
+    args = [x for x in sys.argv[1:] if not x.startswith('--')]
+    features_folder = args[0] if len(args) > 0 else 'data/features'
+
+    if len(args) > 1:
+        # clustered synthetic vectors of the same dimension as the store matrix
+        dim = feature_store.open_store(features_folder).matrix.shape[1]
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(int(args[1]) // 50, dim))
+        vectors = centers[rng.integers(0, centers.shape[0], int(args[1]))] + 0.3 * rng.normal(size=(int(args[1]), dim))
+    else:
+        vectors = np.asarray(feature_store.open_store(features_folder).matrix)
+
+    k = 10
+    queries = vectors[np.random.default_rng(1).choice(vectors.shape[0], min(1000, vectors.shape[0]), replace=False)]
+    print(f'{vectors.shape[0]} vectors of dimension {vectors.shape[1]}, {queries.shape[0]} queries, k={k}')
+
+    exact = ExactIndex.build(vectors)
+    start = time.perf_counter()
+    exact_ids, _ = exact.search(queries, k)
+    print(f'exact batch: {(time.perf_counter() - start) / queries.shape[0] * 1e6:8.1f} us per query')
+    start = time.perf_counter()
+    for q in queries:
+        exact.search(q, k)
+    print(f'exact single: {(time.perf_counter() - start) / queries.shape[0] * 1e6:7.1f} us per query')
+
+    start = time.perf_counter()
+    ivf = IVFIndex.build(vectors)
+    print(f'ivf build: {time.perf_counter() - start:.2f} s, {ivf.centroids.shape[0]} lists')
+
+    # search over memory-mapped arrays of the saved index
+    with tempfile.TemporaryDirectory() as folder:
+        save_index(ivf, folder)
+        ivf = load_index(folder)
+
+        for n_probe in [1, 2, 4, 8, 16, 32]:
+            start = time.perf_counter()
+            ids, _ = ivf.search(queries, k, n_probe=n_probe)
+            seconds = time.perf_counter() - start
+            print(f'ivf n_probe={n_probe:<3} recall@{k}: {recall(exact_ids, ids):.3f}, '
+                  f'{seconds / queries.shape[0] * 1e6:8.1f} us per query')
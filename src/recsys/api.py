@@ -0,0 +1,330 @@
+"""
+Asyncio HTTP/JSON API of the feature store for the Telegram bot
+
+Endpoints (JSON responses):
+    POST /recommend   {"skills": [...], "weights": [...] (optional), "top_k": 5}
+                      -> {"professions": [[name, score], ...], "unknown_skills": [...]}
+    POST /gaps        {"skills": [...], "profession": "Data Scientist", "top_k": 10, "order": "share" | "salary"}
+                      -> {"profession": ..., "missing_skills": [[name, share, salary_q50, uplift], ...],
+                          "unknown_skills": [...]} (see gap_analysis.py)
+    GET  /profession?name=Data%20Scientist -> popular_skills, salary quantiles and frequency of prof.csv
+    GET  /professions, /healthz, /stats (cache counters)
+
+"top_k" must be from 1 to MAX_TOP_K, "weights" must be finite numbers (400 Bad Request otherwise).
+
+Results are cached in LRU cache keyed by the normalized query: skills are resolved to skill ids
+(so 'python', 'Python ' and aliases are the same query), order and duplicates are ignored.
+Identical queries in flight are coalesced: only the first one is computed, others wait for its result.
+Computations run in a thread pool, the event loop only parses requests and serves the cache.
+
+HTTP/1.1 with keep-alive is served by asyncio streams (no web framework dependency).
+
+Exsample of using:
+
+    python -m src.recsys.api data/features cnf 8080
+    curl -d '{"skills": ["Python", "SQL"]}' http://127.0.0.1:8080/recommend
+
+    # load of bursty bot traffic
+    python -m src.recsys.fake_bot http://127.0.0.1:8080 200 50
+
+"""
+
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import math
+import os
+import sys
+from typing import Awaitable, Callable, Dict, Hashable, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import pandas as pd
+from src.recsys.gap_analysis import ORDERS, GapAnalyzer
+from src.recsys.recommender import SkillRecommender
+from src.utils.logger import configurate_logger
+
+log = configurate_logger('Api')
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+MAX_BODY_SIZE = 1 << 20
+MAX_TOP_K = 100
+
+
+class HttpError(Exception):
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ResultCache:
+    """LRU cache of results with coalescing of identical computations in flight"""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.results = OrderedDict()
+        self.in_flight : Dict[Hashable, asyncio.Future] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[object]]) -> object:
+        if key in self.results:
+            self.results.move_to_end(key)
+            self.stats['hits'] += 1
+            return self.results[key]
+
+        if key in self.in_flight:
+            self.stats['coalesced'] += 1
+            future = self.in_flight[key]
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # the request computing the result was cancelled, compute it again
+                return await self.get(key, compute)
+
+        self.stats['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            result = await compute()
+        except Exception as e:
+            future.set_exception(e)
+            # waiters get the exception, the future itself is not awaited
+            future.exception()
+            raise
+        except BaseException:
+            # cancellation of the request: waiters must not hang on unresolved future
+            future.cancel()
+            raise
+        finally:
+            del self.in_flight[key]
+
+        future.set_result(result)
+        self.results[key] = result
+        if len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+
+        return result
+
+
+def _top_k(query: dict, default: int) -> int:
+    top_k = query.get('top_k', default)
+    if not isinstance(top_k, int) or isinstance(top_k, bool) or not 1 <= top_k <= MAX_TOP_K:
+        raise HttpError(400, f'"top_k" must be an integer from 1 to {MAX_TOP_K}')
+    return top_k
+
+
+def _json_value(value):
+    """NaN of pandas to null"""
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+class QueryService:
+    """Queries of the bot over the feature store, results are cached"""
+
+    def __init__(self, features_folder: str = 'data/features', config_folder: str = 'cnf',
+                 cache_size: int = 10000, workers: int = 4):
+        self.recommender = SkillRecommender(features_folder, config_folder)
+        self.analyzer = GapAnalyzer(self.recommender, features_folder)
+        self.prof_to_index = {name: i for i, name in enumerate(self.recommender.prof_names)}
+
+        prof_df = pd.read_csv(os.path.join(features_folder, 'prof.csv'))
+        self.professions = {
+            row['prof_name']: {
+                'profession': row['prof_name'],
+                'salary_q25': _json_value(row['salary_q25']),
+                'salary_q50': _json_value(row['salary_q50']),
+                'salary_q75': _json_value(row['salary_q75']),
+                'frequency': _json_value(row['frequency']),
+                'popular_skills': [] if pd.isna(row['popular_skills']) else row['popular_skills'].split(', '),
+            } for row in prof_df.to_dict(orient='records')}
+
+        self.cache = ResultCache(cache_size)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def normalize(self, skills: List[str]) -> Tuple[Tuple[int, ...], Tuple[str, ...]]:
+        """Sorted unique skill ids and sorted unknown skills of the query"""
+
+        if not isinstance(skills, list) or not all(isinstance(s, str) for s in skills):
+            raise HttpError(400, '"skills" must be a list of strings')
+
+        ids, unknown = self.recommender.resolver.resolve(skills)
+        return tuple(ids.tolist()), tuple(sorted({s.strip().lower() for s in unknown}))
+
+    async def _cached(self, key: Hashable, func: Callable, *args) -> object:
+        loop = asyncio.get_running_loop()
+        return await self.cache.get(key, lambda: loop.run_in_executor(self.executor, func, *args))
+
+    def _recommend(self, ids: Tuple[int, ...], unknown: Tuple[str, ...], weights: Tuple[float, ...], top_k: int) -> dict:
+        index = np.array(ids, dtype=np.int64)
+        relevance = self.recommender.relevance[index]
+        scores = relevance.sum(axis=0) if weights is None else np.array(weights) @ relevance
+        return {'professions': [[name, score] for name, score in self.recommender.top_professions(scores, top_k)],
+                'unknown_skills': list(unknown)}
+
+    async def recommend(self, query: dict) -> dict:
+        skills, weights, top_k = query.get('skills'), query.get('weights'), _top_k(query, 5)
+        if weights is None:
+            ids, unknown = self.normalize(skills)
+            return await self._cached(('recommend', ids, unknown, top_k), self._recommend, ids, unknown, None, top_k)
+
+        self.normalize(skills)
+        if not isinstance(weights, list) or len(weights) != len(skills):
+            raise HttpError(400, '"weights" must be a list of the same length as "skills"')
+        # NaN and Infinity are accepted by json.loads, but scores with them are not valid JSON
+        if not all(isinstance(w, (int, float)) and not isinstance(w, bool) and math.isfinite(w) for w in weights):
+            raise HttpError(400, '"weights" must be finite numbers')
+
+        # weights of the same skill are summed, key is sorted (skill id, weight) pairs
+        resolved = {}
+        unknown = set()
+        for skill, weight in zip(skills, weights):
+            index = self.recommender.resolver.get(skill)
+            if index is None:
+                unknown.add(skill.strip().lower())
+            else:
+                resolved[index] = resolved.get(index, 0.0) + float(weight)
+        ids, weights = tuple(sorted(resolved)), tuple(resolved[i] for i in sorted(resolved))
+        unknown = tuple(sorted(unknown))
+
+        return await self._cached(('recommend', ids, unknown, weights, top_k),
+                                  self._recommend, ids, unknown, weights, top_k)
+
+    def _gaps(self, ids: Tuple[int, ...], unknown: Tuple[str, ...], prof_id: int, top_k: int, order: str) -> dict:
+        missing = self.analyzer.missing(np.array(ids, dtype=np.int64), prof_id, top_k, order)
+        gap = self.analyzer.gap(prof_id, missing, list(unknown))
+        return {'profession': gap.profession,
+                'missing_skills': [[_json_value(x) for x in skill] for skill in gap.missing_skills],
+                'unknown_skills': gap.unknown_skills}
+
+    async def gaps(self, query: dict) -> dict:
+        profession, top_k, order = query.get('profession'), _top_k(query, 10), query.get('order', 'share')
+        if profession not in self.prof_to_index:
+            raise HttpError(404, f'Unknown profession "{profession}"')
+        if order not in ORDERS:
+            raise HttpError(400, f'"order" must be one of {ORDERS}')
+
+        ids, unknown = self.normalize(query.get('skills'))
+        prof_id = self.prof_to_index[profession]
+        return await self._cached(('gaps', ids, unknown, prof_id, top_k, order),
+                                  self._gaps, ids, unknown, prof_id, top_k, order)
+
+    def profession(self, name: str) -> dict:
+        if name not in self.professions:
+            raise HttpError(404, f'Unknown profession "{name}"')
+        return self.professions[name]
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> object:
+        url = urlsplit(target)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        get_routes = {
+            '/healthz': lambda: {'status': 'ok'},
+            '/stats': lambda: {**self.cache.stats, 'cached': len(self.cache.results)},
+            '/professions': lambda: list(self.professions),
+            '/profession': lambda: self.profession(params.get('name')),
+        }
+        post_routes = {'/recommend': self.recommend, '/gaps': self.gaps}
+
+        if url.path in get_routes:
+            if method != 'GET':
+                raise HttpError(405, f'{url.path} supports GET')
+            return get_routes[url.path]()
+
+        if url.path in post_routes:
+            if method != 'POST':
+                raise HttpError(405, f'{url.path} supports POST')
+            try:
+                query = json.loads(body or b'{}')
+            except json.JSONDecodeError as e:
+                raise HttpError(400, f'Invalid JSON: {e}')
+            if not isinstance(query, dict):
+                raise HttpError(400, 'Query must be a JSON object')
+            return await post_routes[url.path](query)
+
+        raise HttpError(404, f'Unknown path {url.path}')
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, str, Dict[str, str], bytes]:
+    """method, target, version, headers (lowercase names), body. Empty method on closed connection"""
+
+    line = await reader.readline()
+    if not line:
+        return '', '', '', {}, b''
+
+    parts = line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise HttpError(400, 'Invalid request line')
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY_SIZE:
+        raise HttpError(400, 'Request body is too large')
+
+    return parts[0], parts[1], parts[2], headers, await reader.readexactly(length)
+
+
+def _response(status: int, payload: object, keep_alive: bool) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = (f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+            f'Content-Type: application/json; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+    return head.encode('latin-1') + body
+
+
+async def serve(service: QueryService, host: str = '0.0.0.0', port: int = 8080) -> None:
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    method, target, version, headers, body = await _read_request(reader)
+                    if method == '':
+                        break
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                    status, payload = 200, await service.dispatch(method, target, body)
+                except HttpError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except (ValueError, TypeError) as e:
+                    status, payload = 400, {'error': str(e)}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                except Exception as e:
+                    log.exception('Request failed')
+                    status, payload = 500, {'error': str(e)}
+
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port, backlog=1024)
+    log.info('Serving API on %s:%s', host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+
+    # positional arguments: features folder, config folder, port
+    args = [x for x in sys.argv[1:] if not x.startswith('--')]
+    features_folder = args[0] if len(args) > 0 else 'data/features'
+    config_folder = args[1] if len(args) > 1 else 'cnf'
+    port = int(args[2]) if len(args) > 2 else 8080
+
+    asyncio.run(serve(QueryService(features_folder, config_folder), port=port))
@@ -0,0 +1,192 @@
+"""
+Education courses on the skill landscape
+
+Catalog of courses is a local csv file ('data/courses/catalog.csv' by default) with columns
+[title, description, skills], skills is a JSON list (see list_encoding.py).
+Every course is mapped to skill ids of the feature store:
+    - listed skills are resolved as free-text skills (skill_names.SkillResolver)
+    - title and description are matched by word n-grams with the same normalization
+      as skill names of FeaturesProcessor (aliases, simplified names)
+Result is sparse binary course x skill matrix.
+
+Coverage of a course for a user and a target profession: share of the skill gap covered by the course,
+gap is top skills of the profession (relevance of the skill in the profession) the user does not have:
+    coverage = gap @ course_skills.T / gap.sum()
+For a batch of users gaps are a sparse users x skills matrix, all courses are scored by one product.
+
+Exsample of using:
+
+    recommender = SkillRecommender('data/features', 'cnf')
+    matcher = CourseMatcher(recommender, 'data/courses/catalog.csv')
+    matcher.recommend(['Python', 'SQL'], 'Data Scientist', top_k=5)
+    matcher.coverage_batch([['Python'], ['Excel']], ['Data Scientist', 'Аналитик BI'])
+
+    # benchmark on a synthetic catalog of the given size
+    python -m src.recsys.courses data/features cnf 5000
+
+"""
+
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from src.recsys.recommender import SkillRecommender
+from src.utils import list_encoding
+
+CATALOG_FILENAME = 'data/courses/catalog.csv'
+CATALOG_COLUMNS = ['title', 'description', 'skills']
+# longest skill name matched in texts, words
+MAX_NGRAM = 3
+
+_words = re.compile(r'[\w+#]+(?:[.\-/][\w+#]+)*')
+
+
+def load_catalog(filename: str = CATALOG_FILENAME) -> pd.DataFrame:
+    """Catalog dataframe [title, description, skills (list)]"""
+
+    if not os.path.isfile(filename):
+        raise ValueError(f'Course catalog does not exist: {filename}')
+
+    df = pd.read_csv(filename)
+    missing = set(CATALOG_COLUMNS) - set(df.columns)
+    if len(missing) > 0:
+        raise ValueError(f'Course catalog {filename} has no columns {sorted(missing)}')
+
+    df['description'] = df['description'].fillna('')
+    df['skills'] = list_encoding.decode_column(df['skills'].fillna('[]'))
+    return df
+
+
+class CourseMatcher:
+    """Courses as skill vectors, coverage of skill gaps of users"""
+
+    def __init__(self, recommender: SkillRecommender, catalog_filename: str = CATALOG_FILENAME,
+                 top_n_skills: int = 50):
+        """top_n_skills: skills of a profession taken into account"""
+
+        self.recommender = recommender
+        self.prof_to_index = {name: i for i, name in enumerate(recommender.prof_names)}
+
+        # profession x skill relevance of top_n_skills of every profession
+        relevance = recommender.relevance.T
+        if top_n_skills < relevance.shape[1]:
+            threshold = -np.partition(-relevance, top_n_skills - 1, axis=1)[:, [top_n_skills - 1]]
+        else:
+            threshold = np.zeros((relevance.shape[0], 1))
+        self.prof_skills = sparse.csr_matrix(np.where((relevance >= threshold) & (relevance > 0), relevance, 0))
+
+        self.catalog : pd.DataFrame = None
+        self.course_skills : sparse.csr_matrix = None
+        if catalog_filename is not None:
+            self.set_catalog(load_catalog(catalog_filename))
+
+    def set_catalog(self, catalog: pd.DataFrame) -> None:
+        self.catalog = catalog
+        self.course_skills = self.match(catalog)
+
+    def _text_skills(self, text: str, cache: Dict[str, int]) -> List[int]:
+        """Skill ids of word n-grams of the text"""
+
+        words = _words.findall(text)
+        ids = []
+        for n in range(1, MAX_NGRAM + 1):
+            for i in range(len(words) - n + 1):
+                ngram = ' '.join(words[i:i + n])
+                if ngram not in cache:
+                    # one letter names (R, C) are matched only by the skills column
+                    cache[ngram] = self.recommender.resolver.get(ngram) if len(ngram) > 1 else None
+                if cache[ngram] is not None:
+                    ids.append(cache[ngram])
+
+        return ids
+
+    def match(self, catalog: pd.DataFrame) -> sparse.csr_matrix:
+        """Binary course x skill matrix of catalog [title, description, skills]"""
+
+        cache = {}
+        indptr, indices = [0], []
+        for title, description, skills in zip(catalog['title'], catalog['description'], catalog['skills']):
+            ids, _ = self.recommender.resolver.resolve(skills)
+            ids = np.union1d(ids, self._text_skills(f'{title} {description}', cache))
+            indices.append(ids)
+            indptr.append(indptr[-1] + ids.shape[0])
+
+        indices = np.concatenate(indices).astype(np.int64) if len(indices) > 0 else np.empty(0, dtype=np.int64)
+        return sparse.csr_matrix((np.ones(indices.shape[0]), indices, np.array(indptr)),
+                                 shape=(len(catalog), self.recommender.skills_count))
+
+    def gaps(self, profiles: List[List[str]], professions: List[str]) -> sparse.csr_matrix:
+        """users x skills relevance of skills of target professions the users do not have"""
+
+        unknown = set(professions) - set(self.prof_to_index)
+        if len(unknown) > 0:
+            raise ValueError(f'Unknown professions {sorted(unknown)}')
+
+        users, _ = self.recommender.profiles_matrix(profiles)
+        targets = self.prof_skills[[self.prof_to_index[p] for p in professions]]
+        return (targets - targets.multiply(users)).tocsr()
+
+    def coverage_batch(self, profiles: List[List[str]], professions: List[str]) -> np.ndarray:
+        """users x courses share of the skill gap of the user covered by the course"""
+
+        gaps = self.gaps(profiles, professions)
+        total = np.asarray(gaps.sum(axis=1))
+        covered = (gaps @ self.course_skills.T).toarray()
+        return covered / np.where(total > 0, total, 1)
+
+    def recommend(self, skills: List[str], profession: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """top_k courses (title, coverage) for the skill gap of the user in the profession"""
+
+        if top_k < 1:
+            raise ValueError(f'top_k must be at least 1, got {top_k}')
+
+        coverage = self.coverage_batch([skills], [profession])[0]
+        if coverage.shape[0] == 0:
+            return []
+        top_k = min(top_k, coverage.shape[0])
+        top = np.argpartition(-coverage, top_k - 1)[:top_k]
+        top = top[np.argsort(-coverage[top], kind='stable')]
+        return [(self.catalog['title'].iloc[i], float(coverage[i])) for i in top if coverage[i] > 0]
+
+
+if __name__ == '__main__':
+
+    # positional arguments: features folder, config folder, count of synthetic courses (catalog file by default)
+    args = [x for x in sys.argv[1:] if not x.startswith('--')]
+    features_folder = args[0] if len(args) > 0 else 'data/features'
+    config_folder = args[1] if len(args) > 1 else 'cnf'
+
+    recommender = SkillRecommender(features_folder, config_folder)
+    rng = np.random.default_rng(0)
+    names = np.array(recommender.skill_names, dtype=object)
+
+    if len(args) > 2:
+        # courses mention skills in the text and list a few of them
+        count = int(args[2])
+        catalog = pd.DataFrame({
+            'title': [f'Курс {i}: {rng.choice(names)}' for i in range(count)],
+            'description': [' и '.join(rng.choice(names, 10)) + '. Практика на реальных задачах' for _ in range(count)],
+            'skills': [list(rng.choice(names, 3)) for _ in range(count)],
+        })
+    else:
+        catalog = load_catalog(CATALOG_FILENAME)
+
+    matcher = CourseMatcher(recommender, None)
+    start = time.perf_counter()
+    matcher.set_catalog(catalog)
+    print(f'{len(catalog)} courses matched in {time.perf_counter() - start:.2f} s, '
+          f'{matcher.course_skills.nnz / max(len(catalog), 1):.1f} skills per course')
+
+    users = 10_000
+    profiles = [list(rng.choice(names, rng.integers(3, 15), replace=False)) for _ in range(users)]
+    professions = list(rng.choice(np.array(recommender.prof_names, dtype=object), users))
+
+    start = time.perf_counter()
+    coverage = matcher.coverage_batch(profiles, professions)
+    print(f'{users} users x {len(catalog)} courses scored in {time.perf_counter() - start:.2f} s')
+
+    print(professions[0], matcher.recommend(profiles[0], professions[0], top_k=3))
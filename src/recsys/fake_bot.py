@@ -0,0 +1,124 @@
+"""
+Fake Telegram bot load of the API (api.py)
+
+Every bot user keeps one keep-alive connection and sends bursts of 1-5 requests with short pauses.
+Queries are repetitive as in the real bot: skill sets are drawn from a small pool of popular profiles
+(Zipf distribution), skills are taken from popular skills of professions (GET /profession).
+Mix of requests: 60% /recommend, 30% /gaps, 10% /profession.
+
+Requests per second, latency percentiles of every endpoint and cache counters of the API are printed.
+
+Exsample of using:
+
+    python -m src.recsys.api data/features cnf 8080
+    python -m src.recsys.fake_bot http://127.0.0.1:8080 200 50
+
+Arguments: url, users (200), requests per user (50)
+"""
+
+import asyncio
+import json
+import sys
+import time
+from typing import Dict, List, Tuple
+from urllib.parse import quote, urlsplit
+import numpy as np
+
+# count of distinct skill sets of bot users
+PROFILES_POOL = 500
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str,
+                  method: str, path: str, payload: dict = None) -> Tuple[int, object]:
+    """(status, json) of one request over keep-alive connection"""
+
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else b''
+    writer.write((f'{method} {path} HTTP/1.1\r\nHost: {host}\r\n'
+                  f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    return status, json.loads(await reader.readexactly(int(headers.get('content-length', 0))))
+
+
+async def bot_user(host: str, port: int, queries: List[Tuple[str, str, dict]], requests: int,
+                   seed: int) -> Dict[str, List[float]]:
+    rng = np.random.default_rng(seed)
+    latency = {}
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        sent = 0
+        while sent < requests:
+            for _ in range(min(int(rng.integers(1, 6)), requests - sent)):
+                # popular queries are much more frequent
+                method, path, payload = queries[min(int(rng.zipf(1.3)) - 1, len(queries) - 1)]
+                start = time.perf_counter()
+                status, _ = await request(reader, writer, host, method, path, payload)
+                if status != 200:
+                    raise ValueError(f'HTTP {status}: {method} {path}')
+                latency.setdefault(path.split('?')[0], []).append(time.perf_counter() - start)
+                sent += 1
+            await asyncio.sleep(float(rng.uniform(0, 0.05)))
+    finally:
+        writer.close()
+
+    return latency
+
+
+async def main(url: str, users: int, requests: int) -> None:
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, professions = await request(reader, writer, host, 'GET', '/professions')
+    popular = {}
+    for p in professions:
+        _, info = await request(reader, writer, host, 'GET', f'/profession?name={quote(p)}')
+        popular[p] = info['popular_skills']
+    writer.close()
+
+    # pool of queries, shuffled so that popularity does not depend on the kind of query
+    rng = np.random.default_rng(0)
+    skills = sorted({s for values in popular.values() for s in values})
+    queries = []
+    for i in range(PROFILES_POOL):
+        profile = list(rng.choice(skills, int(rng.integers(2, 8)), replace=False))
+        kind = rng.random()
+        if kind < 0.6:
+            queries.append(('POST', '/recommend', {'skills': profile}))
+        elif kind < 0.9:
+            queries.append(('POST', '/gaps', {'skills': profile, 'profession': str(rng.choice(professions))}))
+        else:
+            queries.append(('GET', f'/profession?name={quote(str(rng.choice(professions)))}', None))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[bot_user(host, port, queries, requests, seed) for seed in range(users)])
+    seconds = time.perf_counter() - start
+
+    total = sum(len(v) for r in results for v in r.values())
+    print(f'{users} users, {total} requests in {seconds:.1f} s: {total / seconds:.0f} requests/s')
+    for path in sorted({p for r in results for p in r}):
+        latency = np.concatenate([r[path] for r in results if path in r]) * 1000
+        print(f'{path:<12} {latency.shape[0]:7} requests, p50 {np.percentile(latency, 50):6.1f} ms, '
+              f'p99 {np.percentile(latency, 99):6.1f} ms')
+
+    reader, writer = await asyncio.open_connection(host, port)
+    print('cache:', (await request(reader, writer, host, 'GET', '/stats'))[1])
+    writer.close()
+
+
+if __name__ == '__main__':
+
+    url = sys.argv[1] if len(sys.argv) > 1 else 'http://127.0.0.1:8080'
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    asyncio.run(main(url, users, requests))
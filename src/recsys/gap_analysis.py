@@ -0,0 +1,217 @@
+"""
+Skill gap analysis: skills of a target profession the user does not have
+
+Candidates of a profession are all its skills with positive share (profession columns of 'skills.csv',
+share of the skill in the profession), or its top max_candidates skills by share, precomputed in two orders:
+    - 'share': by share in the profession
+    - 'salary': by salary uplift, salary_q50 of the skill minus salary_q50 of the profession
+                (skills without salary are the last ones)
+Candidates are a dense [profession, candidate] array of skill ids, so the answer is the first top_k
+candidates missing in the user skill set.
+
+Skill sets of a batch of users are bitsets (numpy.packbits of users x skills), membership of
+candidates is tested by vectorized gathers over blocks of CANDIDATES_BLOCK candidates of all users,
+the first top_k missing candidates of every user are selected by cumulative sums.
+Next blocks are tested only for users with less than top_k missing candidates found.
+
+Exsample of using:
+
+    recommender = SkillRecommender('data/features', 'cnf')
+    analyzer = GapAnalyzer(recommender, 'data/features')
+    analyzer.gaps(['Python', 'SQL'], 'Data Scientist', top_k=10, order='salary')
+    analyzer.gaps_batch([['Python'], ['Excel']], ['Data Scientist', 'Аналитик BI'], top_k=10)
+
+    # single query and batch of 10k users
+    python -m src.recsys.gap_analysis data/features cnf
+
+"""
+
+from dataclasses import dataclass, field
+import os
+import sys
+import time
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+from src.recsys.recommender import SkillRecommender
+
+ORDERS = ['share', 'salary']
+# candidates of missing_batch tested at once
+CANDIDATES_BLOCK = 128
+
+
+@dataclass
+class Gap:
+    profession : str
+    # [(skill name, share in profession, salary_q50 of the skill, salary uplift)]
+    missing_skills : List[Tuple[str, float, float, float]] = field(default_factory=lambda: [])
+    unknown_skills : List[str] = field(default_factory=lambda: [])
+
+
+class GapAnalyzer:
+    """Missing skills of users for target professions"""
+
+    def __init__(self, recommender: SkillRecommender, features_folder: str = 'data/features',
+                 max_candidates: int = None):
+        """max_candidates: top skills of every profession by share which can be recommended, all by default"""
+
+        self.recommender = recommender
+        self.prof_to_index = {name: i for i, name in enumerate(recommender.prof_names)}
+        self.skill_names = np.array(recommender.skill_names, dtype=object)
+
+        skill_df = pd.read_csv(os.path.join(features_folder, 'skills.csv'))
+        prof_df = pd.read_csv(os.path.join(features_folder, 'prof.csv'))
+        self.skill_salary = np.full(recommender.skills_count, np.nan)
+        self.skill_salary[skill_df.skill_id.to_numpy()] = skill_df.salary_q50.to_numpy()
+        prof_salary = np.full(len(recommender.prof_names), np.nan)
+        prof_salary[prof_df.prof_id.to_numpy()] = prof_df.salary_q50.to_numpy()
+
+        # profession x skill share and salary uplift
+        self.shares = np.ascontiguousarray(recommender.relevance.T)
+        self.uplift = self.skill_salary[np.newaxis, :] - prof_salary[:, np.newaxis]
+
+        # candidates [profession, candidate] in both orders, padded by -1
+        count = (self.shares > 0).sum(axis=1).max()
+        count = count if max_candidates is None else min(max_candidates, count)
+        by_share = np.argsort(-self.shares, axis=1, kind='stable')[:, :count]
+        top_shares = np.take_along_axis(self.shares, by_share, axis=1)
+        by_share = np.where(top_shares > 0, by_share, -1)
+
+        uplift = np.where(by_share >= 0, np.take_along_axis(self.uplift, np.maximum(by_share, 0), axis=1), np.nan)
+        # skills without salary and padding are the last ones (padding is after them in by_share)
+        by_salary = np.take_along_axis(by_share, np.argsort(np.where(np.isnan(uplift), np.inf, -uplift),
+                                                             axis=1, kind='stable'), axis=1)
+        self.candidates = {'share': by_share.astype(np.int32), 'salary': by_salary.astype(np.int32)}
+
+    def _check(self, professions: List[str], order: str) -> np.ndarray:
+        if order not in ORDERS:
+            raise ValueError(f'Unknown order "{order}", expected one of {ORDERS}')
+        unknown = set(professions) - set(self.prof_to_index)
+        if len(unknown) > 0:
+            raise ValueError(f'Unknown professions {sorted(unknown)}')
+        return np.array([self.prof_to_index[p] for p in professions], dtype=np.int64)
+
+    @staticmethod
+    def _check_top_k(top_k: int) -> None:
+        if top_k < 1:
+            raise ValueError(f'top_k must be at least 1, got {top_k}')
+
+    def gap(self, prof_id: int, skill_ids: np.ndarray, unknown: List[str]) -> Gap:
+        """Gap of skill ids of missing_batch or missing"""
+        skill_ids = skill_ids[skill_ids >= 0]
+        return Gap(self.recommender.prof_names[prof_id],
+                   [(self.skill_names[i], float(self.shares[prof_id, i]), float(self.skill_salary[i]),
+                     float(self.uplift[prof_id, i])) for i in skill_ids],
+                   unknown)
+
+    def missing(self, skill_ids: np.ndarray, prof_id: int, top_k: int = 10, order: str = 'share') -> np.ndarray:
+        """First top_k candidates of the profession missing in skill_ids"""
+
+        self._check_top_k(top_k)
+        have = np.zeros(self.shares.shape[1] + 1, dtype=bool)
+        have[skill_ids] = True
+        # padding -1 is the last element, it is always set
+        have[-1] = True
+        candidates = self.candidates[order][prof_id]
+        return candidates[~have[candidates]][:top_k]
+
+    def gaps(self, skills: List[str], profession: str, top_k: int = 10, order: str = 'share') -> Gap:
+        """Missing skills of the user for the profession"""
+
+        prof_id = self._check([profession], order)[0]
+        skill_ids, unknown = self.recommender.resolver.resolve(skills)
+        return self.gap(prof_id, self.missing(skill_ids, prof_id, top_k, order), unknown)
+
+    def bitsets(self, profiles: List[List[str]]) -> Tuple[np.ndarray, List[List[str]]]:
+        """Skill sets of users as bitsets (numpy.uint8 [users, ceil(skills / 8)]) and unknown skills"""
+
+        matrix, unknown = self.recommender.profiles_matrix(profiles)
+        users = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+        dense = np.zeros((matrix.shape[0], (matrix.shape[1] + 7) // 8 * 8), dtype=bool)
+        dense[users, matrix.indices] = True
+        return np.packbits(dense, axis=1), unknown
+
+    def missing_batch(self, bitsets: np.ndarray, prof_ids: np.ndarray, top_k: int = 10,
+                      order: str = 'share') -> np.ndarray:
+        """Skill ids [users, top_k] of the first missing candidates (-1 if there are not enough)"""
+
+        self._check_top_k(top_k)
+        all_candidates = self.candidates[order]
+        result = np.full((prof_ids.shape[0], top_k), -1, dtype=np.int32)
+        found = np.zeros(prof_ids.shape[0], dtype=np.int64)
+        # users with less than top_k missing candidates found and not exhausted candidates
+        users = np.arange(prof_ids.shape[0])
+
+        for start in range(0, all_candidates.shape[1], CANDIDATES_BLOCK):
+            candidates = all_candidates[prof_ids[users], start:start + CANDIDATES_BLOCK]
+            safe = np.maximum(candidates, 0)
+            # bit of every candidate in the bitset of its user
+            have = (bitsets[users[:, np.newaxis], safe >> 3] >> (7 - (safe & 7))) & 1
+            missing = (have == 0) & (candidates >= 0)
+
+            # position of every missing candidate among missing ones
+            rank = found[users][:, np.newaxis] + np.cumsum(missing, axis=1)
+            selected = missing & (rank <= top_k)
+            rows, cols = np.nonzero(selected)
+            result[users[rows], rank[rows, cols] - 1] = candidates[rows, cols]
+
+            found[users] = rank[:, -1]
+            # padding -1 is after all candidates
+            users = users[(found[users] < top_k) & (candidates[:, -1] >= 0)]
+            if users.shape[0] == 0:
+                break
+
+        return result
+
+    def gaps_batch(self, profiles: List[List[str]], professions: List[str], top_k: int = 10,
+                   order: str = 'share') -> List[Gap]:
+        """Missing skills of every user for the target profession of the user"""
+
+        prof_ids = self._check(professions, order)
+        bitsets, unknown = self.bitsets(profiles)
+        missing = self.missing_batch(bitsets, prof_ids, top_k, order)
+        return [self.gap(p, m, u) for p, m, u in zip(prof_ids, missing, unknown)]
+
+
+if __name__ == '__main__':
+
+    # positional arguments: features folder, config folder
+    args = [x for x in sys.argv[1:] if not x.startswith('--')]
+    features_folder = args[0] if len(args) > 0 else 'data/features'
+    config_folder = args[1] if len(args) > 1 else 'cnf'
+
+    analyzer = GapAnalyzer(SkillRecommender(features_folder, config_folder), features_folder)
+
+    rng = np.random.default_rng(0)
+    users = 10_000
+    profiles = [list(rng.choice(analyzer.skill_names, rng.integers(3, 15), replace=False)) for _ in range(users)]
+    professions = list(rng.choice(np.array(analyzer.recommender.prof_names, dtype=object), users))
+
+    print(analyzer.gaps(profiles[0], professions[0], top_k=3, order='salary'))
+
+    prof_ids = analyzer._check(professions, 'share')
+    skill_ids = [analyzer.recommender.resolver.resolve(p)[0] for p in profiles]
+    start = time.perf_counter()
+    for ids, p in zip(skill_ids[:1000], prof_ids):
+        analyzer.missing(ids, p, 10)
+    print(f'single query (resolved skills): {(time.perf_counter() - start) / 1000 * 1e6:.1f} us')
+
+    start = time.perf_counter()
+    for profile, profession in zip(profiles[:1000], professions):
+        analyzer.gaps(profile, profession, 10)
+    print(f'single query: {(time.perf_counter() - start) / 1000 * 1e6:.1f} us')
+
+    start = time.perf_counter()
+    bitsets, _ = analyzer.bitsets(profiles)
+    missing = analyzer.missing_batch(bitsets, prof_ids, 10)
+    print(f'batch of {users} users (bitsets and gaps): {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    start = time.perf_counter()
+    batch = analyzer.gaps_batch(profiles, professions, 10)
+    print(f'batch of {users} users (with names): {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    for order in ORDERS:
+        batch = analyzer.gaps_batch(profiles[:200], professions[:200], 10, order)
+        single = [analyzer.gaps(p, q, 10, order) for p, q in zip(profiles, professions[:200])]
+        if any([x[0] for x in b.missing_skills] != [x[0] for x in g.missing_skills] for b, g in zip(batch, single)):
+            raise AssertionError(f'Batch gaps differ from single ones ({order})')
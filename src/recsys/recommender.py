@@ -0,0 +1,157 @@
+"""
+Recommendation of professions by skills of a user (RecSys of the design doc)
+
+Relevance of a skill for a profession is the share of the skill in the profession column
+of the relationship matrix (as profession columns of 'skills.csv').
+Score of a profession is the weighted sum of relevances of user skills:
+    scores = weights @ relevance[skills]
+Batch of profiles is a sparse users x skills matrix, scores = profiles @ relevance (one sparse-dense product).
+
+Free-text skills are resolved by original names of the feature store and skill aliases
+(see skill_names.py), unknown skills are returned with the recommendation.
+
+Features are loaded once by the constructor.
+
+Exsample of using:
+
+    recommender = SkillRecommender('data/features', 'cnf')
+    recommender.recommend(['Python', 'sql', 'Машинное обучение'], top_k=3)
+    recommender.recommend_batch([['Python', 'SQL'], ['Excel', 'Power BI']], top_k=3)
+
+    # latency benchmark
+    python -m src.recsys.recommender data/features
+
+"""
+
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from src.features import feature_store, skill_names
+
+
+@dataclass
+class Recommendation:
+    professions : List[Tuple[str, float]] = field(default_factory=lambda: [])
+    unknown_skills : List[str] = field(default_factory=lambda: [])
+
+
+class SkillRecommender:
+    """Professions by skills over the skill-profession relationship matrix"""
+
+    def __init__(self, features_folder: str = 'data/features', config_folder: str = 'cnf'):
+        fs = feature_store.open_store(features_folder, mmap=False)
+
+        matrix = np.asarray(fs.matrix, dtype=np.float64)
+        column_sums = matrix.sum(axis=0)
+        # relevance[skill_id, prof_id]: share of the skill in the profession
+        self.relevance = np.ascontiguousarray(matrix / np.where(column_sums > 0, column_sums, 1))
+        self.prof_names = np.array(fs.prof_names.to_list(), dtype=object)
+        self.skill_names = fs.skill_names.to_list()
+
+        # 'skill_aliases.pkl' saved with the features is read if it is actual
+        alias_map = skill_names.load_alias_map(os.path.join(config_folder, 'skill_aliases.json'), features_folder)
+        self.resolver = skill_names.SkillResolver(fs.skill_original_to_index, alias_map)
+
+    @property
+    def skills_count(self) -> int:
+        return self.relevance.shape[0]
+
+    def top_professions(self, scores: np.ndarray, top_k: int) -> List[Tuple[str, float]]:
+        """top_k (profession, score) of scores of all professions, zero scores are skipped"""
+        top_k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.prof_names[i], float(scores[i])) for i in top if scores[i] > 0]
+
+    def scores(self, skills: List[str], weights: Optional[List[float]] = None) -> Tuple[np.ndarray, List[str]]:
+        """Scores of all professions and unknown skills"""
+
+        if weights is None:
+            ids, unknown = self.resolver.resolve(skills)
+            return self.relevance[ids].sum(axis=0), unknown
+
+        # weights of duplicated skills are summed
+        known = [(self.resolver.get(s), w) for s, w in zip(skills, weights)]
+        unknown = [s for s, (i, _) in zip(skills, known) if i is None]
+        known = [(i, w) for i, w in known if i is not None]
+        ids = np.array([i for i, _ in known], dtype=np.int64)
+        w = np.array([w for _, w in known], dtype=np.float64)
+
+        return w @ self.relevance[ids] if ids.shape[0] > 0 else np.zeros(self.relevance.shape[1]), unknown
+
+    def recommend(self, skills: List[str], weights: Optional[List[float]] = None, top_k: int = 5) -> Recommendation:
+        """top_k professions for skills of a user (optionally weighted)"""
+
+        scores, unknown = self.scores(skills, weights)
+        return Recommendation(self.top_professions(scores, top_k), unknown)
+
+    def profiles_matrix(self, profiles: List[List[str]]) -> Tuple[sparse.csr_matrix, List[List[str]]]:
+        """Sparse binary users x skills matrix and unknown skills of every profile"""
+
+        indptr, indices, unknown = [0], [], []
+        for skills in profiles:
+            ids, u = self.resolver.resolve(skills)
+            indices.append(ids)
+            indptr.append(indptr[-1] + ids.shape[0])
+            unknown.append(u)
+
+        indices = np.concatenate(indices) if len(indices) > 0 else np.empty(0, dtype=np.int64)
+        matrix = sparse.csr_matrix((np.ones(indices.shape[0]), indices, np.array(indptr)),
+                                   shape=(len(profiles), self.skills_count))
+        return matrix, unknown
+
+    def scores_batch(self, profiles: sparse.csr_matrix) -> np.ndarray:
+        """Scores users x professions of users x skills matrix"""
+        return np.asarray(profiles @ self.relevance)
+
+    def recommend_batch(self, profiles: List[List[str]], top_k: int = 5) -> List[Recommendation]:
+        """top_k professions for every profile"""
+
+        matrix, unknown = self.profiles_matrix(profiles)
+        scores = self.scores_batch(matrix)
+
+        top_k = min(top_k, scores.shape[1])
+        top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        return [Recommendation([(self.prof_names[i], float(s)) for i, s in zip(ids, values) if s > 0], u)
+                for ids, values, u in zip(top, top_scores, unknown)]
+
+
+if __name__ == '__main__':
+
+    # positional arguments: features folder, config folder
+    args = [x for x in sys.argv[1:] if not x.startswith('--')]
+    features_folder = args[0] if len(args) > 0 else 'data/features'
+    config_folder = args[1] if len(args) > 1 else 'cnf'
+
+    start = time.perf_counter()
+    recommender = SkillRecommender(features_folder, config_folder)
+    print(f'loaded in {(time.perf_counter() - start) * 1000:.1f} ms: '
+          f'{recommender.skills_count} skills, {len(recommender.prof_names)} professions')
+
+    rng = np.random.default_rng(42)
+    names = np.array(recommender.skill_names, dtype=object)
+    profiles = [list(rng.choice(names, rng.integers(3, 15), replace=False)) for _ in range(10_000)]
+
+    print(profiles[0][:5], '->', recommender.recommend(profiles[0], top_k=3).professions)
+
+    start = time.perf_counter()
+    for profile in profiles[:1000]:
+        recommender.recommend(profile, top_k=5)
+    print(f'single request: {(time.perf_counter() - start) / 1000 * 1000:.3f} ms')
+
+    start = time.perf_counter()
+    batch = recommender.recommend_batch(profiles, top_k=5)
+    seconds = time.perf_counter() - start
+    print(f'batch of {len(profiles)} profiles: {seconds * 1000:.1f} ms ({seconds / len(profiles) * 1e6:.1f} us per profile)')
+
+    if any(b.professions != recommender.recommend(p, top_k=5).professions for b, p in zip(batch[:100], profiles)):
+        raise AssertionError('Batch recommendations differ from single ones')
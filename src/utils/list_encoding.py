@@ -0,0 +1,136 @@
+"""
+Canonical encoding of list columns (skills, query) in csv files
+
+Lists are stored as JSON arrays: '["Python", "SQL, базовый"]', empty list is '[]'.
+Previous files contain python repr of lists ("['Python', 'SQL']"),
+they are decoded by ast.literal_eval (slow path) and can be converted once by migrate_file.
+
+Batch decoder parses the whole column as one JSON document, so millions of rows
+are decoded by a single call of the C json parser.
+If the column contains any legacy or missing value, the whole column takes the slow path:
+every row is decoded separately by json, then ast.literal_eval, then legacy split.
+
+Exsample of using:
+
+    df['skills'] = list_encoding.encode_column(df['skills'])
+    df.to_csv(filename)
+
+    skills = list_encoding.decode_column(pd.read_csv(filename)['skills'])
+
+    # one-time conversion of existing files
+    python -m src.utils.list_encoding data/hh_parsed_folder data/processed
+
+"""
+
+import ast
+from itertools import chain
+import json
+import os
+import re
+import sys
+from typing import Iterable, List
+import pandas as pd
+
+LIST_COLUMNS = ['skills', 'query']
+
+_legacy_split = re.compile('\\\\|////|,')
+
+
+def encode_list(values: Iterable[str]) -> str:
+    """Canonical encoding of a list of strings"""
+    return json.dumps([str(x) for x in values], ensure_ascii=False)
+
+
+def _normalize(values: Iterable) -> List[str]:
+    """Elements of decoded list as non-empty strings (the same on both paths of decode_column)"""
+    return [x if isinstance(x, str) else str(x) for x in values if x != '' and str(x) != '']
+
+
+def _decode_value(value) -> List[str]:
+    """Decode one value of any known encoding (slow path)"""
+
+    if isinstance(value, (list, tuple, set)):
+        return [str(x) for x in value]
+    if not isinstance(value, str):
+        # NaN
+        return []
+
+    try:
+        result = json.loads(value)
+    except ValueError:
+        try:
+            result = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            # neither json nor python literal: split as early versions did
+            result = [x.strip(" '\"") for x in re.split(_legacy_split, value.strip('[]'))]
+
+    if not isinstance(result, (list, tuple, set)):
+        # single value
+        result = [result]
+
+    return _normalize(result)
+
+
+def decode_column(column: pd.Series) -> List[List[str]]:
+    """
+        Decode list column.
+        Fast path: the whole column is parsed by one json.loads('[' + ','.join(values) + ']').
+        If it fails, every value is decoded by _decode_value (json, ast.literal_eval, legacy split)
+        Elements are normalized the same way on both paths: strings, empty ones are dropped
+    """
+
+    values = column.tolist()
+    if all(isinstance(x, str) for x in values):
+        try:
+            text = '[' + ','.join(values) + ']'
+            result = json.loads(text)
+            if len(result) == len(values) and all(isinstance(x, list) for x in result):
+                # canonical columns are lists of non-empty strings, others are normalized as on the slow path
+                if '""' in text or set(map(type, chain.from_iterable(result))) - {str}:
+                    result = [_normalize(x) for x in result]
+                return result
+        except ValueError:
+            pass
+
+    return [_decode_value(x) for x in values]
+
+
+def encode_column(column: pd.Series) -> pd.Series:
+    """Encode list column (lists or strings of any known encoding) to canonical encoding"""
+    return pd.Series([encode_list(x) for x in decode_column(column)], index=column.index, name=column.name)
+
+
+def migrate_file(filename: str, columns: List[str] = None) -> int:
+    """
+        Convert list columns of csv file to canonical encoding, the file is replaced atomically
+        Returns count of changed values
+    """
+
+    df = pd.read_csv(filename, encoding='utf-8')
+
+    changed = 0
+    for column in [x for x in (columns or LIST_COLUMNS) if x in df.columns]:
+        encoded = encode_column(df[column])
+        changed += int((encoded != df[column]).sum())
+        df[column] = encoded
+
+    if changed > 0:
+        df.to_csv(filename + '.tmp', index=False, encoding='utf-8')
+        os.replace(filename + '.tmp', filename)
+
+    return changed
+
+
+def migrate_folder(folder: str, columns: List[str] = None) -> int:
+    """Convert all csv files of the folder, returns count of changed values"""
+
+    return sum(migrate_file(os.path.join(folder, fn), columns)
+               for fn in sorted(os.listdir(folder)) if fn.endswith('.csv'))
+
+
+if __name__ == '__main__':
+
+    # positional arguments: folders or files
+    for path in [x for x in sys.argv[1:] if not x.startswith('--')] or ['data/hh_parsed_folder', 'data/processed']:
+        changed = migrate_folder(path) if os.path.isdir(path) else migrate_file(path)
+        print(f'{path}: {changed} values converted')
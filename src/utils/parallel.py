@@ -0,0 +1,52 @@
+"""
+Parallel execution of independent stages on a process pool
+
+Tasks are independent by declaration: every task gets its inputs as arguments
+and returns its results, tasks do not share any state. Results are joined by the caller.
+Functions and arguments must be picklable (module level functions or methods of picklable objects).
+
+Exsample of using:
+
+    results = parallel.run_tasks({
+        'skills': (extract_skills, (df,)),
+        'professions': (extract_professions, (df,)),
+    })
+    results['skills']
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+from typing import Callable, Dict, Tuple
+from src.utils.logger import configurate_logger
+
+log = configurate_logger('Parallel')
+
+
+def _timed(func: Callable, args: tuple) -> Tuple[object, float]:
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run_tasks(tasks: Dict[str, Tuple[Callable, tuple]], max_workers: int = None) -> Dict[str, object]:
+    """
+        Run independent tasks {name: (function, args)} and return {name: result}
+        max_workers: size of process pool, CPU count by default, 1 or 0 - sequential run in this process
+    """
+
+    max_workers = min(len(tasks), max_workers if max_workers is not None else (os.cpu_count() or 1))
+
+    start = time.perf_counter()
+    if max_workers <= 1:
+        timed = {name: _timed(func, args) for name, (func, args) in tasks.items()}
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {name: executor.submit(_timed, func, args) for name, (func, args) in tasks.items()}
+            timed = {name: f.result() for name, f in futures.items()}
+
+    log.info('Tasks finished in %.2f s (%s workers): %s', time.perf_counter() - start, max_workers,
+             ', '.join(f'{name} {seconds:.2f} s' for name, (_, seconds) in timed.items()))
+
+    return {name: result for name, (result, _) in timed.items()}
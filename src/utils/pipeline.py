@@ -0,0 +1,214 @@
+"""
+Small DAG runner with stage caching
+
+Every stage declares its inputs and outputs (files, folders or glob patterns),
+stages it depends on, source files of its code and parameters.
+Fingerprint of a stage is a hash of:
+    - content of input files
+    - content of code files and stage version
+    - parameters (e.g. date for stages fetching new data)
+Stage is skipped if its fingerprint is the same as on the last successful run and all outputs exist.
+Changed outputs change inputs of dependent stages, so they are rerun too.
+
+Fingerprints are saved to state file ('data/pipeline_state.json' by default),
+hashes of files are cached by (mtime, size), so unchanged big files are not read again.
+
+Exsample of using:
+
+    pipeline = Pipeline([
+        Stage('preprocessing', Preprocessor().process,
+              inputs=['data/hh_parsed_folder/*-DATA-*.csv'], outputs=['data/processed/vacancies.csv'],
+              code=['src/data/preprocessing.py']),
+        Stage('features', FeaturesProcessor().process, deps=['preprocessing'],
+              inputs=['data/processed/vacancies.csv'], outputs=['data/features/skills.csv'],
+              code=['src/features/*.py']),
+    ])
+    pipeline.run(force=['features'])
+    print(pipeline.report_str())
+
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+import glob
+from graphlib import TopologicalSorter
+import hashlib
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+import pandas as pd
+from src.utils.logger import configurate_logger
+
+log = configurate_logger('Pipeline')
+
+
+@dataclass
+class Stage:
+    name : str
+    run : Callable[[], object]
+    inputs : List[str] = field(default_factory=lambda: [])
+    outputs : List[str] = field(default_factory=lambda: [])
+    deps : List[str] = field(default_factory=lambda: [])
+    code : List[str] = field(default_factory=lambda: [])
+    # bump to rerun the stage after changes not covered by code files
+    version : str = '1'
+    params : Dict[str, str] = field(default_factory=lambda: {})
+    # count of rows of stage outputs for the report
+    rows : Optional[Callable[[], int]] = None
+
+
+def _expand(paths: Iterable[str]) -> List[str]:
+    """Files of paths: glob patterns are expanded, folders are walked"""
+
+    files = []
+    for path in paths:
+        for p in sorted(glob.glob(path)) if glob.has_magic(path) else [path]:
+            if os.path.isdir(p):
+                files.extend(sorted(os.path.join(root, fn) for root, _, fns in os.walk(p) for fn in fns))
+            elif os.path.isfile(p):
+                files.append(p)
+
+    return files
+
+
+class Pipeline:
+    """Run stages in order of dependencies, skip up-to-date ones"""
+
+    def __init__(self, stages: List[Stage], state_filename: str = 'data/pipeline_state.json'):
+        self.stages = {s.name: s for s in stages}
+        for stage in stages:
+            unknown = set(stage.deps) - set(self.stages)
+            if len(unknown) > 0:
+                raise ValueError(f'Stage "{stage.name}" depends on unknown stages {sorted(unknown)}')
+
+        self.state_filename = state_filename
+        self.state = self._load_state()
+        self.report : pd.DataFrame = None
+
+    def _load_state(self) -> dict:
+        if not os.path.isfile(self.state_filename):
+            return {'stages': {}, 'files': {}}
+
+        with open(self.state_filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_state(self) -> None:
+        folder = os.path.dirname(self.state_filename)
+        if folder != '':
+            os.makedirs(folder, exist_ok=True)
+        with open(self.state_filename + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=4)
+        os.replace(self.state_filename + '.tmp', self.state_filename)
+
+    def _file_hash(self, filename: str) -> str:
+        """md5 of file content, cached by (mtime, size)"""
+
+        stat = os.stat(filename)
+        cached = self.state['files'].get(filename)
+        if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+        md5 = hashlib.md5()
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                md5.update(chunk)
+
+        self.state['files'][filename] = [stat.st_mtime_ns, stat.st_size, md5.hexdigest()]
+        return md5.hexdigest()
+
+    def fingerprint(self, stage: Stage) -> str:
+        md5 = hashlib.md5()
+        md5.update(json.dumps([stage.version, stage.params], sort_keys=True).encode('utf-8'))
+        for kind, paths in [('input', stage.inputs), ('code', stage.code)]:
+            for fn in _expand(paths):
+                md5.update(f'{kind}:{fn}:{self._file_hash(fn)}'.encode('utf-8'))
+
+        return md5.hexdigest()
+
+    def is_up_to_date(self, stage: Stage) -> bool:
+        previous = self.state['stages'].get(stage.name)
+        return previous is not None and \
+            previous['fingerprint'] == self.fingerprint(stage) and \
+            all(len(_expand([x])) > 0 for x in stage.outputs)
+
+    def order(self) -> List[str]:
+        """Stage names in order of dependencies (declaration order for independent stages)"""
+
+        sorter = TopologicalSorter({name: stage.deps for name, stage in self.stages.items()})
+        sorter.prepare()
+        position = {name: i for i, name in enumerate(self.stages)}
+
+        result = []
+        while sorter.is_active():
+            ready = sorted(sorter.get_ready(), key=position.get)
+            result.extend(ready)
+            sorter.done(*ready)
+
+        return result
+
+    def run(self, force: Iterable[str] = (), only: Iterable[str] = None) -> pd.DataFrame:
+        """
+            Run stages which are not up-to-date
+            force: stage names to run regardless of fingerprints ('all' for every stage)
+            only: stage names to consider, all by default
+
+            Returns report [stage, status, seconds, rows], saved to self.report too
+        """
+
+        force = set(force)
+        unknown = force - set(self.stages) - {'all'}
+        if len(unknown) > 0:
+            raise ValueError(f'Unknown stages {sorted(unknown)}, expected {list(self.stages)}')
+
+        report = []
+        for name in self.order():
+            stage = self.stages[name]
+            if only is not None and name not in only:
+                continue
+
+            if name not in force and 'all' not in force and self.is_up_to_date(stage):
+                log.info('Stage "%s" is up-to-date, skipped', name)
+                previous = self.state['stages'][name]
+                report.append([name, 'skipped', 0.0, previous.get('rows')])
+                continue
+
+            log.info('Running stage "%s"...', name)
+            fingerprint = self.fingerprint(stage)
+            start = time.perf_counter()
+            try:
+                stage.run()
+            except Exception:
+                report.append([name, 'failed', time.perf_counter() - start, None])
+                self.report = pd.DataFrame(report, columns=['stage', 'status', 'seconds', 'rows'])
+                self._save_state()
+                log.error('Stage "%s" failed', name)
+                raise
+            seconds = time.perf_counter() - start
+
+            rows = stage.rows() if stage.rows is not None else None
+            self.state['stages'][name] = {
+                'fingerprint': fingerprint,
+                'finished': datetime.now().isoformat(timespec='seconds'),
+                'seconds': round(seconds, 3),
+                'rows': rows,
+            }
+            self._save_state()
+
+            log.info('Stage "%s" finished in %.1f s, rows: %s', name, seconds, rows)
+            report.append([name, 'done', seconds, rows])
+
+        self.report = pd.DataFrame(report, columns=['stage', 'status', 'seconds', 'rows'])
+        return self.report
+
+    def report_str(self) -> str:
+        """Human readable report of the last run"""
+
+        if self.report is None:
+            return 'Pipeline was not run'
+
+        lines = [f'{r.stage:<20} {r.status:<8} {r.seconds:10.1f} s   rows: {"-" if pd.isna(r.rows) else int(r.rows)}'
+                 for r in self.report.itertuples()]
+        lines.append(f'{"total":<20} {"":<8} {self.report.seconds.sum():10.1f} s')
+
+        return '\n'.join(lines)
@@ -0,0 +1,127 @@
+"""
+Streaming approximate quantiles (t-digest style sketch)
+
+The sketch keeps weighted centroids. Centroids are small near the tails and
+bigger in the middle (k1 scale function of t-digest), so the tail quantiles
+stay accurate and the memory is O(compression) regardless of the data size.
+Sketches are mergeable: sketch of a union is a merge of sketches.
+While the sketch holds no more than `compression` values all centroids are
+single values and quantiles are exact (linear interpolation like numpy.quantile).
+
+Exsample of using:
+
+    sketch = QuantileSketch()
+    sketch.update(df.salary_mid.to_numpy())
+    sketch.merge(other_sketch)
+    q25, q50, q75 = sketch.quantile([0.25, 0.50, 0.75])
+
+"""
+
+from typing import Iterable, Union
+import numpy as np
+
+
+class QuantileSketch:
+    """Mergeable approximate quantile sketch"""
+
+    def __init__(self, compression: int = 200, buffer_size: int = 5000):
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self._means = np.empty(0)
+        self._weights = np.empty(0)
+        self._buffer = []
+        self._buffered = 0
+
+    @property
+    def count(self) -> float:
+        """Total weight (number of values) in the sketch"""
+        return self._weights.sum() + self._buffered
+
+    def _k_scale(self, q: np.ndarray) -> np.ndarray:
+        return self.compression / (2 * np.pi) * np.arcsin(2 * np.clip(q, 0, 1) - 1)
+
+    def _compress(self) -> None:
+        """Merge buffer with centroids and recompute centroids"""
+
+        if self._buffered == 0:
+            return
+
+        means = np.concatenate([self._means] + [x[0] for x in self._buffer])
+        weights = np.concatenate([self._weights] + [x[1] for x in self._buffer])
+        self._buffer = []
+        self._buffered = 0
+
+        order = np.argsort(means, kind='stable')
+        means = means[order]
+        weights = weights[order]
+
+        if means.shape[0] <= self.compression:
+            self._means, self._weights = means, weights
+            return
+
+        # neighbour values with the same integer part of k scale form one centroid,
+        #  so every centroid spans about one unit of k scale
+        total = weights.sum()
+        q_mid = (np.cumsum(weights) - weights / 2) / total
+        bins = np.floor(self._k_scale(q_mid) - self._k_scale(0.0))
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+
+        self._weights = np.add.reduceat(weights, starts)
+        self._means = np.add.reduceat(means * weights, starts) / self._weights
+
+    def update(self, values: Union[Iterable[float], np.ndarray], weights: np.ndarray = None) -> 'QuantileSketch':
+        """Add values to the sketch, NaN values are ignored"""
+
+        values = np.asarray(values, dtype=float).ravel()
+        weights = np.ones(values.shape[0]) if weights is None else np.asarray(weights, dtype=float).ravel()
+        mask = ~np.isnan(values)
+        if mask.any():
+            self._buffer.append((values[mask], weights[mask]))
+            self._buffered += int(mask.sum())
+            if self._buffered >= self.buffer_size:
+                self._compress()
+
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Merge other sketch into this one"""
+
+        other._compress()
+        if other._weights.shape[0] > 0:
+            self._buffer.append((other._means, other._weights))
+            self._buffered += other._weights.shape[0]
+            self._compress()
+
+        return self
+
+    def quantile(self, q: Union[float, Iterable[float]]) -> Union[float, np.ndarray]:
+        """Approximate quantile(s), NaN for empty sketch"""
+
+        self._compress()
+
+        scalar = np.ndim(q) == 0
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        if self._weights.shape[0] == 0:
+            result = np.full(q.shape[0], np.nan)
+        else:
+            # centroid centers in "rank" coordinates, target rank as in numpy linear method
+            centers = np.cumsum(self._weights) - self._weights + (self._weights - 1) / 2
+            result = np.interp(q * (self._weights.sum() - 1), centers, self._means)
+
+        return result[0] if scalar else result
+
+    def __getstate__(self):
+        self._compress()
+        return self.__dict__.copy()
+
+
+if __name__ == '__main__':
+
+    values = np.random.default_rng(42).lognormal(11.5, 0.5, size=1_000_000)
+    sketch = QuantileSketch()
+    for chunk in np.array_split(values, 100):
+        sketch.merge(QuantileSketch().update(chunk))
+
+    print('centroids:', sketch._means.shape[0])
+    print('exact:    ', np.quantile(values, [0.25, 0.50, 0.75]))
+    print('estimated:', sketch.quantile([0.25, 0.50, 0.75]))